@@ -1,5 +1,6 @@
 from fastapi import Depends, HTTPException, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.container import Container
 from app.services.auth_service import AuthService, oauth2_scheme
 from app.services.user_service import UserService
 from app.services.transaction_service import TransactionService
@@ -7,44 +8,46 @@ from app.services.loan_service import LoanService
 from app.repositories.user_repository import UserRepository
 from app.repositories.transaction_repository import TransactionRepository
 from app.repositories.loan_repository import LoanRepository
+from app.repositories.rollup_repository import RollupRepository
 from app.services.admin_service import AdminService
 from app.models.user import UserInDB
 
 from fastapi import Request
 
-async def get_db(request: Request) -> AsyncIOMotorDatabase:
-    return request.app.state.database
+# Repositories and services are application singletons built once in the
+# lifespan (see app.core.container); these dependencies only look them up.
+# They stay `async def` so FastAPI calls them inline instead of sending each
+# one to the threadpool.
 
-async def get_user_repository(db: AsyncIOMotorDatabase = Depends(get_db)) -> UserRepository:
-    return UserRepository(db)
+async def get_container(request: Request) -> Container:
+    return request.app.state.container
 
-async def get_transaction_repository(db: AsyncIOMotorDatabase = Depends(get_db)) -> TransactionRepository:
-    return TransactionRepository(db)
+async def get_db(container: Container = Depends(get_container)) -> AsyncIOMotorDatabase:
+    return container.db
 
-async def get_loan_repository(db: AsyncIOMotorDatabase = Depends(get_db)) -> LoanRepository:
-    return LoanRepository(db)
+async def get_user_repository(container: Container = Depends(get_container)) -> UserRepository:
+    return container.user_repository
 
-async def get_auth_service(
-    user_repository: UserRepository = Depends(get_user_repository)
-) -> AuthService:
-    return AuthService(user_repository)
+async def get_transaction_repository(container: Container = Depends(get_container)) -> TransactionRepository:
+    return container.transaction_repository
 
-async def get_user_service(
-    user_repository: UserRepository = Depends(get_user_repository)
-) -> UserService:
-    return UserService(user_repository)
+async def get_loan_repository(container: Container = Depends(get_container)) -> LoanRepository:
+    return container.loan_repository
 
-async def get_transaction_service(
-    transaction_repository: TransactionRepository = Depends(get_transaction_repository),
-    user_repository: UserRepository = Depends(get_user_repository)
-) -> TransactionService:
-    return TransactionService(transaction_repository, user_repository)
+async def get_rollup_repository(container: Container = Depends(get_container)) -> RollupRepository:
+    return container.rollup_repository
 
-async def get_loan_service(
-    loan_repository: LoanRepository = Depends(get_loan_repository),
-    user_repository: UserRepository = Depends(get_user_repository)
-) -> LoanService:
-    return LoanService(loan_repository, user_repository)
+async def get_auth_service(container: Container = Depends(get_container)) -> AuthService:
+    return container.auth_service
+
+async def get_user_service(container: Container = Depends(get_container)) -> UserService:
+    return container.user_service
+
+async def get_transaction_service(container: Container = Depends(get_container)) -> TransactionService:
+    return container.transaction_service
+
+async def get_loan_service(container: Container = Depends(get_container)) -> LoanService:
+    return container.loan_service
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
@@ -62,9 +65,5 @@ async def get_current_admin(
         )
     return current_user
 
-async def get_admin_service(
-    user_repository: UserRepository = Depends(get_user_repository),
-    transaction_repository: TransactionRepository = Depends(get_transaction_repository),
-    loan_repository: LoanRepository = Depends(get_loan_repository)
-) -> AdminService:
-    return AdminService(user_repository, transaction_repository, loan_repository)
+async def get_admin_service(container: Container = Depends(get_container)) -> AdminService:
+    return container.admin_service
@@ -1,13 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Optional, Literal
+from datetime import datetime
+from zoneinfo import ZoneInfoNotFoundError
 
-from app.models.user import UserInDB, User
+from app.models.user import UserInDB
 from app.models.transaction import TransactionsResponse
 from app.models.loan import LoanResponse, LoansResponse
 from app.services.user_service import UserService
 from app.services.transaction_service import TransactionService
 from app.services.loan_service import LoanService
 from app.api.dependencies import get_user_service, get_transaction_service, get_loan_service, get_current_admin, get_admin_service
+from app.core.pagination import InvalidCursorError, next_cursor
+from app.core.cache import user_cache
+from app.core.monitoring import pool_metrics
+from app.core.slow_queries import slow_query_log
+from app.core.tracing import trace_sink
+from app.core.export import MEDIA_TYPES
+from app.core.serialization import FastJSONResponse, public_users
 
 router = APIRouter()
 
@@ -15,65 +25,88 @@ router = APIRouter()
 async def get_all_users(
     limit: int = 10,
     offset: int = 0,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_admin),
     user_service: UserService = Depends(get_user_service)
 ):
-    users = await user_service.get_all_users(limit, offset)
+    try:
+        users = await user_service.get_all_users(limit, offset, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     total = await user_service.count_users()
     
-    # Convert UserInDB to User (remove password)
-    user_list = [
-        User(
-            id=user.id,
-            email=user.email,
-            firstName=user.firstName,
-            lastName=user.lastName,
-            accountNumber=user.accountNumber,
-            balance=user.balance,
-            createdAt=user.createdAt,
-            role=user.role
-        ) for user in users
-    ]
-    
-    return {
-        "users": user_list,
+    return FastJSONResponse({
+        "users": public_users(users),
         "total": total,
         "limit": limit,
-        "offset": offset
-    }
+        "offset": offset,
+        "nextCursor": next_cursor(users, "createdAt", limit)
+    })
 
 @router.get("/transactions", response_model=TransactionsResponse)
 async def get_all_transactions(
     limit: int = 10,
     offset: int = 0,
     type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_admin),
+    transaction_service: TransactionService = Depends(get_transaction_service)
+):
+    try:
+        transactions, total = await transaction_service.get_all_transactions(limit, offset, type, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return FastJSONResponse({
+        "transactions": transactions,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "nextCursor": next_cursor(transactions, "timestamp", limit)
+    })
+
+@router.get("/transactions/export")
+async def export_all_transactions(
+    format: Literal["csv", "ndjson"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type: Optional[Literal["transfer", "deposit", "withdrawal"]] = None,
+    account: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_admin),
     transaction_service: TransactionService = Depends(get_transaction_service)
 ):
-    transactions, total = await transaction_service.get_all_transactions(limit, offset, type)
+    """
+    Stream all transactions, or one account's, as CSV or NDJSON
+    """
+    chunks = transaction_service.export_transactions(format, account, start, end, type)
     
-    return TransactionsResponse(
-        transactions=transactions,
-        total=total,
-        limit=limit,
-        offset=offset
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'}
     )
 
 @router.get("/transactions/chart")
 async def get_transaction_chart_data(
-    days: int = 14,
+    days: int = Query(14, ge=1, le=366),
+    timezone: Optional[str] = None,
+    by_type: bool = False,
     current_user: UserInDB = Depends(get_current_admin),
     admin_service = Depends(get_admin_service)
 ):
     """
-    Get transaction data grouped by day for charts
+    Get transaction data grouped by day for charts, optionally in an IANA
+    timezone and broken down by transaction type
     """
-    chart_data = await admin_service.get_transaction_chart_data(days)
+    try:
+        chart_data = await admin_service.get_transaction_chart_data(days, timezone, by_type)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown timezone: {timezone}")
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": chart_data
-    }
+    })
 
 @router.get("/transactions/distribution")
 async def get_transaction_type_distribution(
@@ -85,41 +118,44 @@ async def get_transaction_type_distribution(
     """
     distribution_data = await admin_service.get_transaction_distribution()
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": distribution_data
-    }
+    })
 
 @router.get("/users/growth")
 async def get_user_growth(
-    months: int = 12,
+    months: int = Query(12, ge=1, le=120),
+    cumulative: bool = False,
     current_user: UserInDB = Depends(get_current_admin),
     admin_service = Depends(get_admin_service)
 ):
     """
-    Get user registration growth data over time
+    Get user registration growth data over time, optionally with cumulative totals
     """
-    growth_data = await admin_service.get_user_growth_data(months)
+    growth_data = await admin_service.get_user_growth_data(months, cumulative)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": growth_data
-    }
+    })
 
 @router.get("/loans/distribution")
 async def get_loan_status_distribution(
+    include_amounts: bool = False,
     current_user: UserInDB = Depends(get_current_admin),
     admin_service = Depends(get_admin_service)
 ):
     """
-    Get distribution of loans by status (pending, approved, rejected, completed)
+    Get distribution of loans by status (pending, approved, rejected, paid),
+    optionally with the total amount per status
     """
-    distribution_data = await admin_service.get_loan_status_distribution()
+    distribution_data = await admin_service.get_loan_status_distribution(include_amounts)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": distribution_data
-    }
+    })
 
 @router.get("/activity")
 async def get_recent_activity(
@@ -132,28 +168,34 @@ async def get_recent_activity(
     """
     activity_data = await admin_service.get_recent_system_activity(limit)
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": activity_data
-    }
+    })
 
 @router.get("/loans", response_model=dict)
 async def get_all_loans(
     limit: int = 10,
     offset: int = 0,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_admin),
     loan_service: LoanService = Depends(get_loan_service)
 ):
-    loans, total = await loan_service.get_all_loans(limit, offset, status)
+    try:
+        loans, total = await loan_service.get_all_loans(limit, offset, status, cursor)
+    except InvalidCursorError as e:
+        # The status query parameter shadows fastapi.status here
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": loans,
         "total": total,
         "limit": limit,
-        "offset": offset
-    }
+        "offset": offset,
+        "nextCursor": next_cursor(loans, "requestDate", limit)
+    })
 
 @router.put("/loans/{loan_id}/approve", response_model=LoanResponse)
 async def approve_loan(
@@ -163,11 +205,11 @@ async def approve_loan(
 ):
     success, message, loan = await loan_service.approve_loan(loan_id)
     
-    return LoanResponse(
-        success=success,
-        message=message,
-        loan=loan
-    )
+    return FastJSONResponse({
+        "success": success,
+        "message": message,
+        "loan": loan
+    })
 
 @router.put("/loans/{loan_id}/reject", response_model=LoanResponse)
 async def reject_loan(
@@ -177,8 +219,64 @@ async def reject_loan(
 ):
     success, message, loan = await loan_service.reject_loan(loan_id)
     
-    return LoanResponse(
-        success=success,
-        message=message,
-        loan=loan
-    )
+    return FastJSONResponse({
+        "success": success,
+        "message": message,
+        "loan": loan
+    })
+
+@router.get("/system/cache")
+async def get_user_cache_stats(
+    current_user: UserInDB = Depends(get_current_admin)
+):
+    """
+    Get hit/miss statistics for this worker's authenticated-user cache
+    """
+    return FastJSONResponse({
+        "success": True,
+        "data": user_cache.stats()
+    })
+
+@router.get("/system/pool")
+async def get_connection_pool_stats(
+    current_user: UserInDB = Depends(get_current_admin)
+):
+    """
+    Get MongoDB connection pool usage for this worker: checked-out connections,
+    wait-queue times and connection churn per server
+    """
+    return FastJSONResponse({
+        "success": True,
+        "data": pool_metrics.stats()
+    })
+
+@router.get("/system/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: UserInDB = Depends(get_current_admin)
+):
+    """
+    Get this worker's most recent slow MongoDB commands, newest first, with the
+    repository method that issued them and their explained query plan
+    """
+    return FastJSONResponse({
+        "success": True,
+        "data": {
+            **slow_query_log.stats(),
+            "queries": slow_query_log.recent(limit)
+        }
+    })
+
+@router.get("/system/traces")
+async def get_sampled_traces(
+    limit: int = Query(20, ge=1, le=1000),
+    current_user: UserInDB = Depends(get_current_admin)
+):
+    """
+    Get this worker's most recently sampled request traces (span trees), newest
+    first. Empty unless TRACE_SAMPLE_RATE > 0 and TRACE_OUTPUT is "memory"
+    """
+    return FastJSONResponse({
+        "success": True,
+        "data": trace_sink.recent(limit)
+    })
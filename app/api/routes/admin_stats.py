@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from app.services.admin_service import AdminService
 from app.api.dependencies import get_admin_service, get_current_admin
 from app.models.user import UserInDB
+from app.core.serialization import FastJSONResponse
 
 router = APIRouter()
 
@@ -11,7 +12,7 @@ async def get_admin_stats(
     admin_service: AdminService = Depends(get_admin_service)
 ):
     stats = await admin_service.get_admin_dashboard_stats()
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": stats
-    }
+    })
@@ -2,9 +2,13 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.models.auth import LoginRequest, LoginResponse, RegisterResponse
-from app.models.user import UserCreate, User
+from app.models.user import UserCreate
 from app.services.auth_service import AuthService
 from app.api.dependencies import get_auth_service
+from app.core.serialization import FastJSONResponse, public_user
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -16,31 +20,21 @@ async def login(
     user = await auth_service.authenticate_user(form_data.username, form_data.password)
     
     if not user:
-        return LoginResponse(
-            success=False,
-            message="Invalid email or password"
-        )
+        return FastJSONResponse({
+            "success": False,
+            "message": "Invalid email or password",
+            "token": None,
+            "user": None
+        })
     
     access_token = auth_service.create_access_token(user)
     
-    # Convert UserInDB to User (remove password)
-    user_response = User(
-        id=user.id,
-        email=user.email,
-        firstName=user.firstName,
-        lastName=user.lastName,
-        accountNumber=user.accountNumber,
-        balance=user.balance,
-        createdAt=user.createdAt,
-        role=user.role
-    )
-    
-    return LoginResponse(
-        success=True,
-        message="Login successful",
-        token=access_token,
-        user=user_response
-    )
+    return FastJSONResponse({
+        "success": True,
+        "message": "Login successful",
+        "token": access_token,
+        "user": public_user(user)
+    })
 
 @router.post("/register", response_model=RegisterResponse)
 async def register(
@@ -50,38 +44,27 @@ async def register(
     try:
         user = await auth_service.register_user(user_data)
         
-        # Convert UserInDB to User (remove password)
-        user_response = User(
-            id=user.id,
-            email=user.email,
-            firstName=user.firstName,
-            lastName=user.lastName,
-            accountNumber=user.accountNumber,
-            balance=user.balance,
-            createdAt=user.createdAt,
-            role=user.role
-        )
-        access_token = auth_service.create_access_token(user)
-        
-        return RegisterResponse(
-            success=True,
-            message="Registration successful",
-            token=access_token,
-            user=user_response
-        )
+        return FastJSONResponse({
+            "success": True,
+            "message": "Registration successful",
+            "user": public_user(user)
+        })
     except HTTPException as e:
-        return RegisterResponse(
-            success=False,
-            message=e.detail
-        )
+        return FastJSONResponse({
+            "success": False,
+            "message": e.detail,
+            "user": None
+        })
     except ValueError as e:
-        return RegisterResponse(
-            success=False,
-            message=str(e)
-        )
+        return FastJSONResponse({
+            "success": False,
+            "message": str(e),
+            "user": None
+        })
     except Exception as e:
-        auth_service.logger.exception("An unexpected error occurred during registration.")
-        return RegisterResponse(
-            success=False,
-            message="An unexpected error occurred during registration."
-        )
+        logger.exception("An unexpected error occurred during registration.")
+        return FastJSONResponse({
+            "success": False,
+            "message": "An unexpected error occurred during registration.",
+            "user": None
+        })
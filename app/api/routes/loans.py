@@ -4,6 +4,7 @@ from app.models.user import UserInDB
 from app.models.loan import LoanCreate, LoanResponse, LoansResponse
 from app.services.loan_service import LoanService
 from app.api.dependencies import get_loan_service, get_current_user
+from app.core.serialization import FastJSONResponse
 
 router = APIRouter()
 
@@ -15,11 +16,11 @@ async def apply_for_loan(
 ):
     loan = await loan_service.apply_for_loan(current_user.id, loan_data)
     
-    return LoanResponse(
-        success=True,
-        message="Loan application submitted successfully",
-        loan=loan
-    )
+    return FastJSONResponse({
+        "success": True,
+        "message": "Loan application submitted successfully",
+        "loan": loan
+    })
 
 @router.get("", response_model=dict)
 async def get_loans(
@@ -29,7 +30,7 @@ async def get_loans(
     loans = await loan_service.get_user_loans(current_user.id)
     
     # Return in the format expected by the frontend
-    return {
+    return FastJSONResponse({
         "success": True,
         "data": loans
-    }
+    })
@@ -1,10 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Optional
+from fastapi.responses import StreamingResponse
+from typing import Optional, Literal
+from datetime import datetime
 
 from app.models.user import UserInDB
-from app.models.transaction import TransactionCreate, TransactionResponse, TransactionsResponse
+from app.models.transaction import (
+    BatchTransferCreate, BatchTransferResponse, TransactionCreate, TransactionResponse, TransactionsResponse
+)
 from app.services.transaction_service import TransactionService
 from app.api.dependencies import get_transaction_service, get_current_user
+from app.core.pagination import InvalidCursorError, next_cursor
+from app.core.export import MEDIA_TYPES
+from app.core.serialization import FastJSONResponse
 
 router = APIRouter()
 
@@ -19,28 +26,76 @@ async def create_transaction(
         transaction_data
     )
     
-    return TransactionResponse(
-        success=success,
-        message=message,
-        transaction=transaction
-    )
+    return FastJSONResponse({
+        "success": success,
+        "message": message,
+        "transaction": transaction
+    })
+
+@router.post("/batch", response_model=BatchTransferResponse)
+async def create_batch_transfer(
+    batch: BatchTransferCreate,
+    current_user: UserInDB = Depends(get_current_user),
+    transaction_service: TransactionService = Depends(get_transaction_service)
+):
+    """
+    Send many transfers from the current user's account in one request, with
+    a result per item
+    """
+    success, message, results = await transaction_service.create_batch_transfer(current_user.id, batch)
+    completed = sum(1 for result in results if result.success)
+
+    return FastJSONResponse({
+        "success": success,
+        "message": message,
+        "completed": completed,
+        "rejected": len(results) - completed,
+        "results": results
+    })
 
 @router.get("", response_model=dict)
 async def get_transactions(
     limit: int = 10,
     offset: int = 0,
     type: Optional[str] = None,
+    cursor: Optional[str] = None,
     current_user: UserInDB = Depends(get_current_user),
     transaction_service: TransactionService = Depends(get_transaction_service)
 ):
-    transactions, total = await transaction_service.get_user_transactions(
-        current_user.accountNumber,
-        limit,
-        offset
-    )
+    try:
+        transactions, _ = await transaction_service.get_user_transactions(
+            current_user.accountNumber,
+            limit,
+            offset,
+            cursor,
+            include_total=False
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     # Return in the format expected by the frontend
-    return {
+    return FastJSONResponse({
         "success": True,
-        "data": transactions
-    }
+        "data": transactions,
+        "nextCursor": next_cursor(transactions, "timestamp", limit)
+    })
+
+@router.get("/export")
+async def export_transactions(
+    format: Literal["csv", "ndjson"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    type: Optional[Literal["transfer", "deposit", "withdrawal"]] = None,
+    current_user: UserInDB = Depends(get_current_user),
+    transaction_service: TransactionService = Depends(get_transaction_service)
+):
+    """
+    Stream the current user's full statement as CSV or NDJSON
+    """
+    chunks = transaction_service.export_transactions(format, current_user.accountNumber, start, end, type)
+    
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="statement-{current_user.accountNumber}.{format}"'}
+    )
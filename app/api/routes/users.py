@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 
-from app.models.user import UserInDB, User, UserProfileUpdate
+from app.models.user import UserInDB, UserProfileUpdate
 from app.services.user_service import UserService
 from app.api.dependencies import get_user_service, get_current_user
+from app.core.serialization import FastJSONResponse, public_user
 
 router = APIRouter()
 
@@ -10,21 +11,10 @@ router = APIRouter()
 async def get_user_profile(
     current_user: UserInDB = Depends(get_current_user)
 ):
-    user = User(
-        id=current_user.id,
-        email=current_user.email,
-        firstName=current_user.firstName,
-        lastName=current_user.lastName,
-        accountNumber=current_user.accountNumber,
-        balance=current_user.balance,
-        createdAt=current_user.createdAt,
-        role=current_user.role
-    )
-    
-    return {
+    return FastJSONResponse({
         "success": True,
-        "data": user
-    }
+        "data": public_user(current_user)
+    })
 
 @router.put("/profile", response_model=dict)
 async def update_user_profile(
@@ -40,7 +30,7 @@ async def update_user_profile(
             detail="Failed to update profile. Email may already be in use."
         )
     
-    return {
+    return FastJSONResponse({
         "success": True,
         "message": "Profile updated successfully",
         "user": {
@@ -49,4 +39,4 @@ async def update_user_profile(
             "firstName": updated_user.firstName,
             "lastName": updated_user.lastName,
         }
-    }
+    })
@@ -0,0 +1,33 @@
+"""
+Account number allocation.
+
+Account numbers are ten digits: nine random digits followed by a Luhn check
+digit, so a mistyped digit (or two swapped neighbours) in a transfer's
+recipient is an invalid number rather than someone else's account. They are
+drawn at random rather than from a counter, so they reveal nothing about the
+number or order of sign-ups; uniqueness is enforced by the accountNumber
+unique index, and UserRepository.create draws again on the rare collision.
+"""
+import secrets
+
+ACCOUNT_NUMBER_PAYLOAD_DIGITS = 9
+
+
+def luhn_check_digit(payload: str) -> str:
+    total = 0
+    # Double every second digit starting from the rightmost payload digit
+    for position, digit in enumerate(reversed(payload)):
+        value = int(digit)
+        if position % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def generate_account_number() -> str:
+    # No leading zero, so the number survives being handled as an integer
+    lowest = 10 ** (ACCOUNT_NUMBER_PAYLOAD_DIGITS - 1)
+    payload = str(lowest + secrets.randbelow(9 * lowest))
+    return payload + luhn_check_digit(payload)
@@ -11,10 +11,76 @@ class Settings(BaseSettings):
     JWT_SECRET: str = os.getenv("JWT_SECRET", "e9ba480a2499a0c0ff41e2cdcf4bebc4b2dea4dc77ca40ec1b9256537bbf68ae")
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_SECONDS: int = 86400  # 24 hours
+
+    # Password hashing; calibrate BCRYPT_ROUNDS with `python -m app.core.security`.
+    # Stored hashes with a different cost are rehashed on the next login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Authenticated-user cache; the TTL is the maximum staleness of the
+    # profile and balance returned for the current user (0 disables it)
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 5.0
     
     # Database settings
     MONGODB_URI: str = os.getenv("MONGODB_URI")
     DATABASE_NAME: str = os.getenv("DATABASE_NAME", "floosy_db")
+    RUN_MIGRATIONS_ON_STARTUP: bool = True
+
+    # Motor connection pool, per worker process. Unset values keep the
+    # driver defaults; GET /api/admin/system/pool shows how the pool is used
+    MONGODB_MAX_POOL_SIZE: int = 100
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None
+    MONGODB_CONNECT_TIMEOUT_MS: int = 20000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGODB_SOCKET_TIMEOUT_MS: Optional[int] = None
+    # Comma-separated, in order of preference: zstd, snappy, zlib
+    # (zstd and snappy need the zstandard / python-snappy packages)
+    MONGODB_COMPRESSORS: str = ""
+    # Default write concern: w is a number of members or "majority"
+    MONGODB_WRITE_CONCERN_W: Optional[str] = None
+    MONGODB_WRITE_CONCERN_JOURNAL: Optional[bool] = None
+    MONGODB_WRITE_CONCERN_TIMEOUT_MS: Optional[int] = None
+
+    # Serve admin analytics from the pre-aggregated rollup collection
+    # instead of scanning raw history, once `python -m app.core.migrations
+    # rebuild-rollups` has filled it; until then raw history is still used
+    ANALYTICS_READ_FROM_ROLLUPS: bool = True
+    # Send @analytics repository reads to replica-set secondaries lagging at
+    # most this far behind the primary (the server minimum is 90 seconds)
+    ANALYTICS_READ_FROM_SECONDARIES: bool = True
+    ANALYTICS_MAX_STALENESS_SECONDS: int = 90
+
+    # Documents fetched per round trip by streaming exports
+    EXPORT_BATCH_SIZE: int = 1000
+    # Most payouts accepted by one POST /api/transactions/batch
+    BATCH_TRANSFER_MAX_ITEMS: int = 5000
+
+    # Build models from stored documents without re-validating them
+    TRUSTED_HYDRATION: bool = True
+    
+    # Prometheus metrics at GET /metrics, off by default. With
+    # METRICS_TOKEN set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_ENABLED: bool = False
+    METRICS_TOKEN: Optional[str] = None
+    # Commands at least this slow are logged and explained (0 disables);
+    # GET /api/admin/system/slow-queries shows the last SLOW_QUERY_LOG_SIZE
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_LOG_SIZE: int = 200
+    SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS: float = 60.0
+    # Per-request spans: the full span tree of TRACE_SAMPLE_RATE of requests
+    # written as NDJSON to TRACE_OUTPUT (a file path, or "memory" for
+    # GET /api/admin/system/traces)
+    TRACING_ENABLED: bool = True
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_OUTPUT: str = "memory"
+    TRACE_BUFFER_SIZE: int = 100
+    # Span timings in a Server-Timing header on every response. For local
+    # profiling only: it names internal methods to any client, and a login's
+    # bcrypt span shows whether the email is registered.
+    SERVER_TIMING_HEADER: bool = False
     
     # CORS settings
     FRONTEND_URL: str = os.getenv("FRONTEND_URL", "http://localhost:3000")
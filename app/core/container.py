@@ -0,0 +1,43 @@
+"""
+Application-scoped object graph.
+
+Repositories and services hold no per-request state, only the shared Motor
+database, so one instance of each is built when the application starts and
+reused by every request. The lifespan stores the container on
+app.state.container; app.api.dependencies hands its members to the routes.
+
+Tests can swap the whole graph with
+    app.dependency_overrides[get_container] = lambda: Container(test_db)
+or replace a single member by overriding its own dependency.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.repositories.user_repository import UserRepository
+from app.repositories.transaction_repository import TransactionRepository
+from app.repositories.loan_repository import LoanRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.services.auth_service import AuthService
+from app.services.user_service import UserService
+from app.services.transaction_service import TransactionService
+from app.services.loan_service import LoanService
+from app.services.admin_service import AdminService
+
+
+class Container:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+        self.user_repository = UserRepository(db)
+        self.transaction_repository = TransactionRepository(db)
+        self.loan_repository = LoanRepository(db)
+        self.rollup_repository = RollupRepository(db)
+
+        self.auth_service = AuthService(self.user_repository)
+        self.user_service = UserService(self.user_repository)
+        self.transaction_service = TransactionService(self.transaction_repository, self.user_repository)
+        self.loan_service = LoanService(self.loan_repository, self.user_repository)
+        self.admin_service = AdminService(
+            self.user_repository,
+            self.transaction_repository,
+            self.loan_repository,
+            self.rollup_repository
+        )
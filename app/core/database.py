@@ -1,17 +1,50 @@
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure
 from app.core.config import settings
+from app.core.monitoring import pool_metrics
+from app.core.metrics import command_metrics
+from app.core.slow_queries import slow_query_log
 from fastapi import FastAPI
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 client: AsyncIOMotorClient = None
 
+# Flipped off the first time the server rejects a transaction (standalone mongod)
+transactions_supported = True
+
+def mongo_client_options() -> Dict[str, Any]:
+    """Keyword arguments for AsyncIOMotorClient built from the settings"""
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS,
+        "journal": settings.MONGODB_WRITE_CONCERN_JOURNAL,
+        "wTimeoutMS": settings.MONGODB_WRITE_CONCERN_TIMEOUT_MS,
+        "event_listeners": [pool_metrics],
+    }
+    if settings.METRICS_ENABLED:
+        options["event_listeners"].append(command_metrics)
+    if slow_query_log.enabled:
+        options["event_listeners"].append(slow_query_log)
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    w = settings.MONGODB_WRITE_CONCERN_W
+    if w:
+        options["w"] = int(w) if w.isdigit() else w
+    # None means "driver default"; pymongo rejects explicit None for some options
+    return {key: value for key, value in options.items() if value is not None}
+
 async def connect_to_mongo(app: FastAPI) -> AsyncGenerator:
     global client
     try:
-        client = AsyncIOMotorClient(settings.MONGODB_URI)
+        client = AsyncIOMotorClient(settings.MONGODB_URI, **mongo_client_options())
         app.state.database = client[settings.DATABASE_NAME]
         await client.admin.command('ping')
         logger.info("Connected to MongoDB")
@@ -21,13 +54,36 @@ async def connect_to_mongo(app: FastAPI) -> AsyncGenerator:
             # Fallback to local MongoDB
             local_uri = "mongodb://localhost:27017"
             logger.info("Attempting to connect to local MongoDB...")
-            client = AsyncIOMotorClient(local_uri)
+            client = AsyncIOMotorClient(local_uri, **mongo_client_options())
             app.state.database = client[settings.DATABASE_NAME]
             await client.admin.command('ping')
             logger.info("Connected to local MongoDB successfully")
         except Exception as local_error:
             logger.error(f"Failed to connect to local MongoDB as well: {local_error}")
             raise Exception("Could not connect to any MongoDB instance")
+
+    slow_query_log.bind(client)
+
+    # Imported here: the container pulls in the repositories, which depend
+    # on this module
+    from app.core.container import Container
+    app.state.container = Container(app.state.database)
+
+    from app.core.migrations import missing_unique_indexes, run_migrations
+    if settings.RUN_MIGRATIONS_ON_STARTUP:
+        try:
+            await run_migrations(app.state.database)
+        except Exception as e:
+            logger.error(f"Failed to apply database migrations: {e}")
+
+    # Unique ids, emails and account numbers are enforced by these indexes
+    # alone; serving without them would let duplicates in
+    missing = await missing_unique_indexes(app.state.database)
+    if missing:
+        raise RuntimeError(
+            f"Missing unique indexes: {', '.join(missing)}. Run `python -m app.core.migrations migrate` "
+            "(a build that fails on duplicate keys needs the duplicates resolved first)"
+        )
         
     yield
     await close_mongo_connection(app)
@@ -39,3 +95,26 @@ async def close_mongo_connection(app: FastAPI):
 
 async def get_database() -> AsyncIOMotorDatabase:
     return client[settings.DATABASE_NAME]
+
+async def run_in_transaction(
+    db: AsyncIOMotorDatabase,
+    callback: Callable[[Optional[AsyncIOMotorClientSession]], Awaitable[Any]]
+) -> Any:
+    """
+    Run callback(session) inside a multi-document transaction, retrying
+    transient errors. Standalone servers cannot run transactions; there the
+    callback is invoked with session=None and must compensate on failure.
+    """
+    global transactions_supported
+    if transactions_supported:
+        try:
+            async with await db.client.start_session() as session:
+                return await session.with_transaction(callback)
+        except OperationFailure as e:
+            # IllegalOperation: "Transaction numbers are only allowed on a
+            # replica set member or mongos". Raised before anything is written.
+            if e.code != 20:
+                raise
+            transactions_supported = False
+            logger.warning("MongoDB deployment does not support transactions; using compensating writes")
+    return await callback(None)
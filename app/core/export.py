@@ -0,0 +1,83 @@
+"""
+Incremental CSV / NDJSON encoders for streaming exports.
+
+Both take an async iterator of documents and yield encoded chunks of
+rows_per_chunk rows, so memory stays bounded by one chunk whatever the
+export size.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+import csv
+import io
+import json
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+# Leading characters that make spreadsheet applications evaluate a cell
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value: Any) -> Any:
+    value = _plain(value)
+    # Text such as a transfer description is user input: quote it so it
+    # opens as text rather than as a formula (numbers are left as numbers)
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+async def csv_chunks(
+    docs: AsyncIterator[Dict[str, Any]],
+    fields: List[str],
+    rows_per_chunk: int = 500
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    # Send the header right away so the download starts before the first batch
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+
+    rows = 0
+    async for doc in docs:
+        writer.writerow([_csv_cell(doc.get(field)) for field in fields])
+        rows += 1
+        if rows == rows_per_chunk:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if rows:
+        yield buffer.getvalue().encode()
+
+
+async def ndjson_chunks(
+    docs: AsyncIterator[Dict[str, Any]],
+    fields: List[str],
+    rows_per_chunk: int = 500
+) -> AsyncIterator[bytes]:
+    lines = []
+    async for doc in docs:
+        lines.append(json.dumps({field: _plain(doc.get(field)) for field in fields}))
+        if len(lines) == rows_per_chunk:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+ENCODERS = {
+    "csv": csv_chunks,
+    "ndjson": ndjson_chunks,
+}
@@ -0,0 +1,176 @@
+"""
+Prometheus metrics, served in text format at GET /metrics.
+
+- HTTP: latency histogram per method, route template and status, and the
+  number of requests in flight, recorded by MetricsMiddleware (a plain ASGI
+  middleware, so streaming responses are timed until their last chunk).
+- MongoDB: command latency histogram per collection and command, and failed
+  commands, recorded by CommandMetrics from pymongo's command events.
+- Money movement: transactions by type and outcome.
+- Caches and pools: the authenticated-user cache, the bcrypt worker queue
+  and the Motor connection pool are read from their own counters when
+  Prometheus scrapes, so they cost nothing per request.
+
+Metrics live in the worker process; scrape each worker (or run one worker
+per container).
+"""
+from typing import Any, Dict, Iterator, Tuple
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+
+from app.core.cache import user_cache
+from app.core.monitoring import pool_metrics
+from app.core.security import password_hasher
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being served",
+    ["method"],
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency as measured by the driver",
+    ["collection", "command"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "MongoDB commands that returned an error",
+    ["collection", "command"],
+)
+TRANSACTIONS = Counter(
+    "floosy_transactions_total",
+    "Transfers, deposits and withdrawals by outcome",
+    ["type", "outcome"],
+)
+
+# Requests that matched no route share one label value
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _child(metric, cache: Dict[Tuple, Any], labels: Tuple):
+    # metric.labels() hashes and validates on every call; resolved children
+    # are cached per label tuple
+    child = cache.get(labels)
+    if child is None:
+        child = cache[labels] = metric.labels(*labels)
+    return child
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._latency: Dict[Tuple, Any] = {}
+        self._in_flight: Dict[Tuple, Any] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = _child(REQUESTS_IN_FLIGHT, self._in_flight, (method,))
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            template = getattr(route, "path", UNMATCHED_ROUTE)
+            _child(REQUEST_LATENCY, self._latency, (method, template, str(status_code))).observe(
+                time.perf_counter() - started
+            )
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self._started: Dict[Tuple, Tuple[str, str]] = {}
+        self._latency: Dict[Tuple, Any] = {}
+        self._failures: Dict[Tuple, Any] = {}
+
+    def started(self, event):
+        # The collection is the value of the command's first field for CRUD
+        # commands; getMore names it separately
+        name = event.command_name
+        if name == "getMore":
+            collection = event.command.get("collection", "")
+        else:
+            collection = event.command.get(name, "")
+        if not isinstance(collection, str):
+            collection = ""
+        self._started[(event.connection_id, event.request_id)] = (collection, name)
+
+    def succeeded(self, event):
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            _child(MONGO_COMMAND_LATENCY, self._latency, labels).observe(event.duration_micros / 1_000_000)
+
+    def failed(self, event):
+        labels = self._started.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            _child(MONGO_COMMAND_LATENCY, self._latency, labels).observe(event.duration_micros / 1_000_000)
+            _child(MONGO_COMMAND_FAILURES, self._failures, labels).inc()
+
+
+class StatsCollector:
+    """Exposes counters the application already keeps, read at scrape time"""
+
+    def collect(self) -> Iterator:
+        cache = user_cache.stats()
+        yield CounterMetricFamily("floosy_user_cache_hits", "Authenticated-user cache hits", value=cache["hits"])
+        yield CounterMetricFamily("floosy_user_cache_misses", "Authenticated-user cache misses", value=cache["misses"])
+        yield CounterMetricFamily(
+            "floosy_user_cache_evictions", "Authenticated-user cache LRU evictions", value=cache["evictions"]
+        )
+        yield CounterMetricFamily(
+            "floosy_user_cache_invalidations", "Authenticated-user cache invalidations", value=cache["invalidations"]
+        )
+        yield GaugeMetricFamily("floosy_user_cache_entries", "Authenticated-user cache size", value=cache["size"])
+
+        hasher = password_hasher.stats()
+        yield GaugeMetricFamily("floosy_bcrypt_workers", "bcrypt worker threads", value=hasher["workers"])
+        yield GaugeMetricFamily("floosy_bcrypt_in_flight", "bcrypt hashes running or queued", value=hasher["inFlight"])
+        yield GaugeMetricFamily("floosy_bcrypt_queued", "bcrypt hashes waiting for a worker", value=hasher["queued"])
+        yield CounterMetricFamily("floosy_bcrypt_completed", "bcrypt hashes completed", value=hasher["completed"])
+
+        checked_out = GaugeMetricFamily(
+            "mongodb_pool_checked_out_connections", "Connections checked out of the pool", labels=["address"]
+        )
+        open_connections = GaugeMetricFamily("mongodb_pool_open_connections", "Open pool connections", labels=["address"])
+        waiting = GaugeMetricFamily("mongodb_pool_waiting", "Operations waiting for a connection", labels=["address"])
+        for address, pool in pool_metrics.stats()["pools"].items():
+            checked_out.add_metric([address], pool["checkedOut"])
+            open_connections.add_metric([address], pool["open"])
+            waiting.add_metric([address], pool["waiting"])
+        yield checked_out
+        yield open_connections
+        yield waiting
+
+
+command_metrics = CommandMetrics()
+REGISTRY.register(StatsCollector())
+
+
+def render_metrics() -> bytes:
+    return generate_latest(REGISTRY)
@@ -0,0 +1,301 @@
+"""
+Versioned schema migrations and index management.
+
+Every repository declares the indexes its queries rely on in an ``INDEXES``
+class attribute. Migrations are applied in version order and recorded in the
+``schema_migrations`` collection, so each one runs once per database. Index
+builds on MongoDB 4.2+ only take an exclusive lock at the start and end of the
+build, so they can run against a live deployment.
+
+Usage:
+    python -m app.core.migrations migrate   # apply pending migrations
+    python -m app.core.migrations status    # list applied/pending versions
+    python -m app.core.migrations verify    # explain() every repository query
+                                            # (SCAN: collection scan, OPEN:
+                                            # cursor page with an unbounded
+                                            # index scan)
+    python -m app.core.migrations rebuild-rollups  # recompute analytics rollups
+
+Migrations run at startup, so they are limited to idempotent index builds.
+Recomputing the analytics rollups from history is a separate, explicit step:
+run ``rebuild-rollups`` once when upgrading a database that predates them,
+and whenever they need repairing. Admin analytics keep reading raw history
+until the first rebuild.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import argparse
+import asyncio
+import logging
+import time
+
+from bson.son import SON
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from app.core.pagination import apply_cursor, encode_cursor
+from app.core.slow_queries import plan_stages, winning_plan_stages
+from app.repositories.user_repository import UserRepository
+from app.repositories.transaction_repository import TransactionRepository, recent_activity_pipeline
+from app.repositories.loan_repository import LoanRepository
+from app.repositories.rollup_repository import RollupRepository
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+# Collection name -> repository declaring its indexes
+INDEXED_REPOSITORIES = {
+    "users": UserRepository,
+    "transactions": TransactionRepository,
+    "loans": LoanRepository,
+    "analytics_rollups": RollupRepository,
+}
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    apply: Callable[[AsyncIOMotorDatabase], Awaitable[None]]
+
+
+async def ensure_declared_indexes(db: AsyncIOMotorDatabase) -> None:
+    """Create every index declared by the repositories (idempotent)."""
+    for collection_name, repository in INDEXED_REPOSITORIES.items():
+        names = await db[collection_name].create_indexes(repository.INDEXES)
+        logger.info(f"Ensured indexes on {collection_name}: {', '.join(names)}")
+
+
+async def missing_unique_indexes(db: AsyncIOMotorDatabase) -> List[str]:
+    """Declared unique indexes absent from the database, as "collection.index" names."""
+    missing = []
+    for collection_name, repository in INDEXED_REPOSITORIES.items():
+        existing = await db[collection_name].index_information()
+        for index in repository.INDEXES:
+            spec = index.document
+            if spec.get("unique") and not existing.get(spec["name"], {}).get("unique"):
+                missing.append(f"{collection_name}.{spec['name']}")
+    return missing
+
+
+async def drop_indexes(db: AsyncIOMotorDatabase, obsolete: Dict[str, List[str]]) -> None:
+    """Drop indexes superseded by newer declarations, ignoring ones already gone."""
+    for collection_name, index_names in obsolete.items():
+        existing = await db[collection_name].index_information()
+        for name in index_names:
+            if name in existing:
+                await db[collection_name].drop_index(name)
+                logger.info(f"Dropped index {collection_name}.{name}")
+
+
+async def add_pagination_indexes(db: AsyncIOMotorDatabase) -> None:
+    # Listings sort on (timestamp|createdAt|requestDate, id); the id suffix
+    # lets keyset pages seek and sort entirely from the index
+    await ensure_declared_indexes(db)
+    await drop_indexes(db, {
+        "users": ["createdAt"],
+        "transactions": ["fromAccount_timestamp", "toAccount_timestamp", "type_timestamp", "timestamp"],
+        "loans": ["status_requestDate", "requestDate"],
+    })
+
+
+async def create_rollup_indexes(db: AsyncIOMotorDatabase) -> None:
+    # Only the index: the rollups themselves are filled by the explicit
+    # `rebuild-rollups` command. Aggregating the full history would block
+    # startup on a large database, and every starting worker would run it.
+    await ensure_declared_indexes(db)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Create repository indexes for users, transactions and loans", ensure_declared_indexes),
+    Migration(2, "Extend listing indexes with id for keyset pagination", add_pagination_indexes),
+    Migration(3, "Create the analytics rollup index", create_rollup_indexes),
+]
+
+
+async def get_applied_versions(db: AsyncIOMotorDatabase) -> Dict[int, dict]:
+    applied = {}
+    async for record in db[MIGRATIONS_COLLECTION].find():
+        applied[record["_id"]] = record
+    return applied
+
+
+async def run_migrations(db: AsyncIOMotorDatabase) -> List[int]:
+    """Apply pending migrations in order and return the versions applied."""
+    applied = await get_applied_versions(db)
+    newly_applied = []
+
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+
+        logger.info(f"Applying migration {migration.version}: {migration.description}")
+        started = time.perf_counter()
+        await migration.apply(db)
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            await db[MIGRATIONS_COLLECTION].insert_one({
+                "_id": migration.version,
+                "description": migration.description,
+                "appliedAt": datetime.utcnow(),
+                "durationMs": round(duration_ms, 2),
+            })
+        except DuplicateKeyError:
+            # Another worker applied it concurrently; migrations only build
+            # indexes, so running one twice is harmless
+            pass
+        newly_applied.append(migration.version)
+
+    return newly_applied
+
+
+# Representative query shapes issued by the repositories, checked by verify_query_plans.
+# Each entry is (repository method, collection, filter or aggregation pipeline, sort).
+QUERY_SHAPES: List[Tuple[str, str, Union[Dict[str, Any], List[dict]], Optional[List[Tuple[str, int]]]]] = [
+    ("UserRepository.get_by_id", "users", {"id": ""}, None),
+    ("UserRepository.get_by_email", "users", {"email": ""}, None),
+    ("UserRepository.get_by_account_number", "users", {"accountNumber": ""}, None),
+    ("UserRepository.get_summaries_by_ids", "users", {"id": {"$in": ["", " "]}}, None),
+    ("UserRepository.get_monthly_registrations", "users",
+     {"createdAt": {"$gte": datetime(1970, 1, 1), "$lte": datetime(1970, 1, 1)}}, None),
+    ("UserRepository.count_registered_before", "users", {"createdAt": {"$lt": datetime(1970, 1, 1)}}, None),
+    ("UserRepository.get_all", "users", {}, [("createdAt", -1), ("id", -1)]),
+    ("TransactionRepository.get_by_id", "transactions", {"id": ""}, None),
+    ("TransactionRepository.get_by_account", "transactions",
+     {"$or": [{"fromAccount": ""}, {"toAccount": ""}]}, [("timestamp", -1), ("id", -1)]),
+    ("TransactionRepository.get_all", "transactions", {}, [("timestamp", -1), ("id", -1)]),
+    ("TransactionRepository.get_all(type)", "transactions", {"type": "transfer"}, [("timestamp", -1), ("id", -1)]),
+    ("LoanRepository.get_by_id", "loans", {"id": ""}, None),
+    ("LoanRepository.get_by_user", "loans", {"userId": ""}, None),
+    ("LoanRepository.get_all", "loans", {}, [("requestDate", -1), ("id", -1)]),
+    ("LoanRepository.get_all(status)", "loans", {"status": "pending"}, [("requestDate", -1), ("id", -1)]),
+    ("TransactionRepository.get_recent_activity", "transactions", recent_activity_pipeline(10), None),
+    ("RollupRepository.get_range", "analytics_rollups",
+     {"period": "day", "start": {"$gte": datetime(1970, 1, 1), "$lt": datetime(1970, 1, 2)}}, [("start", 1)]),
+]
+
+# Keyset pages after a cursor, as (method, collection, filter, sort, sort field).
+# Besides avoiding a collection scan, every index scan must be bounded on the
+# sort field, or each page reads all the newer keys again.
+_CURSOR = encode_cursor(datetime(1970, 1, 1), "")
+_ACCOUNT_HISTORY = {"$or": [{"fromAccount": ""}, {"toAccount": ""}]}
+SEEK_SHAPES: List[Tuple[str, str, Dict[str, Any], List[Tuple[str, int]], str]] = [
+    ("UserRepository.get_all(cursor)", "users",
+     apply_cursor({}, "createdAt", _CURSOR), [("createdAt", -1), ("id", -1)], "createdAt"),
+    ("TransactionRepository.get_by_account(cursor)", "transactions",
+     apply_cursor(_ACCOUNT_HISTORY, "timestamp", _CURSOR), [("timestamp", -1), ("id", -1)], "timestamp"),
+    ("TransactionRepository.get_all(cursor)", "transactions",
+     apply_cursor({}, "timestamp", _CURSOR), [("timestamp", -1), ("id", -1)], "timestamp"),
+    ("TransactionRepository.get_all(type, cursor)", "transactions",
+     apply_cursor({"type": "transfer"}, "timestamp", _CURSOR), [("timestamp", -1), ("id", -1)], "timestamp"),
+    ("LoanRepository.get_all(cursor)", "loans",
+     apply_cursor({}, "requestDate", _CURSOR), [("requestDate", -1), ("id", -1)], "requestDate"),
+    ("LoanRepository.get_all(status, cursor)", "loans",
+     apply_cursor({"status": "pending"}, "requestDate", _CURSOR), [("requestDate", -1), ("id", -1)], "requestDate"),
+]
+
+# Index bounds covering every value of a field
+_FULL_RANGE = {"[MinKey, MaxKey]", "[MaxKey, MinKey]"}
+
+
+def unbounded_index_scans(plan: Any, field: str) -> List[str]:
+    """Names of the index scans in a plan that read every key of field"""
+    unbounded = []
+    if isinstance(plan, dict):
+        if plan.get("stage") == "IXSCAN":
+            bounds = plan.get("indexBounds", {}).get(field)
+            if not bounds or any(interval in _FULL_RANGE for interval in bounds):
+                unbounded.append(plan.get("indexName", "?"))
+        for value in plan.values():
+            unbounded.extend(unbounded_index_scans(value, field))
+    elif isinstance(plan, list):
+        for item in plan:
+            unbounded.extend(unbounded_index_scans(item, field))
+    return unbounded
+
+
+async def _winning_plan(db: AsyncIOMotorDatabase, collection_name: str, query: Dict[str, Any], sort) -> dict:
+    cursor = db[collection_name].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    explanation = await cursor.explain()
+    return explanation.get("queryPlanner", {}).get("winningPlan", {})
+
+
+async def verify_query_plans(db: AsyncIOMotorDatabase) -> List[dict]:
+    """
+    Explain each repository query shape and report whether it scans the
+    collection and, for cursor pages, whether its index scans are bounded.
+    """
+    results = []
+    for method, collection_name, query, sort in QUERY_SHAPES:
+        if isinstance(query, list):
+            # Pipelines: the winning plan of every stage that reads a
+            # collection, $unionWith subpipelines included
+            explanation = await db.command(SON([
+                ("explain", SON([("aggregate", collection_name), ("pipeline", query), ("cursor", {})])),
+                ("verbosity", "queryPlanner"),
+            ]))
+            stages = winning_plan_stages(explanation)
+        else:
+            stages = plan_stages(await _winning_plan(db, collection_name, query, sort))
+        results.append({
+            "method": method,
+            "collection": collection_name,
+            "stages": stages,
+            "usesIndex": "COLLSCAN" not in stages,
+            "bounded": True,
+        })
+    for method, collection_name, query, sort, field in SEEK_SHAPES:
+        plan = await _winning_plan(db, collection_name, query, sort)
+        stages = plan_stages(plan)
+        results.append({
+            "method": method,
+            "collection": collection_name,
+            "stages": stages,
+            "usesIndex": "COLLSCAN" not in stages,
+            "bounded": not unbounded_index_scans(plan, field),
+        })
+    return results
+
+
+async def _main(command: str) -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.config import settings
+
+    client = AsyncIOMotorClient(settings.MONGODB_URI or "mongodb://localhost:27017")
+    db = client[settings.DATABASE_NAME]
+    try:
+        if command == "migrate":
+            versions = await run_migrations(db)
+            print(f"Applied migrations: {versions}" if versions else "Database is up to date")
+        elif command == "status":
+            applied = await get_applied_versions(db)
+            for migration in MIGRATIONS:
+                record = applied.get(migration.version)
+                state = f"applied {record['appliedAt']:%Y-%m-%d %H:%M}" if record else "pending"
+                print(f"{migration.version:>4}  {state:<24}  {migration.description}")
+        elif command == "verify":
+            results = await verify_query_plans(db)
+            for result in results:
+                marker = "SCAN" if not result["usesIndex"] else "OPEN" if not result["bounded"] else "ok  "
+                print(f"{marker}  {result['method']:<48}  {' > '.join(result['stages'])}")
+            if not all(result["usesIndex"] and result["bounded"] for result in results):
+                return 1
+        elif command == "rebuild-rollups":
+            count = await RollupRepository(db).rebuild()
+            print(f"Rebuilt {count} rollup documents")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Floosy database migrations")
+    parser.add_argument("command", choices=["migrate", "status", "verify", "rebuild-rollups"])
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.command)))
@@ -0,0 +1,178 @@
+"""
+Connection pool metrics from pymongo's CMAP events.
+
+PoolMetrics is registered as an event listener on the Motor client and
+keeps, per server address, the number of open and checked-out connections,
+how long operations waited in the pool's wait queue and how often
+connections were opened and closed. Counters are per worker process;
+GET /api/admin/system/pool returns them.
+
+pymongo calls listeners synchronously on the thread running the operation
+(Motor's executor threads), so handlers only update counters under a lock.
+"""
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+import threading
+import time
+
+from pymongo import monitoring
+
+from app.core.config import settings
+
+# Recent checkout waits kept per pool for the percentiles
+WAIT_SAMPLES = 1000
+
+
+def _percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class PoolStats:
+    def __init__(self):
+        self.open = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.created = 0
+        self.closed = 0
+        self.closed_reasons: Counter = Counter()
+        self.checkouts = 0
+        self.checkout_failures: Counter = Counter()
+        self.cleared = 0
+        self.waits = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.recent_waits_ms: deque = deque(maxlen=WAIT_SAMPLES)
+
+    def record_wait(self, wait_ms: float) -> None:
+        self.waits += 1
+        self.wait_total_ms += wait_ms
+        self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+        self.recent_waits_ms.append(wait_ms)
+
+    def snapshot(self, max_pool_size: int) -> Dict[str, Any]:
+        waits = sorted(self.recent_waits_ms)
+        return {
+            "open": self.open,
+            "checkedOut": self.checked_out,
+            "maxCheckedOut": self.max_checked_out,
+            "utilization": round(self.checked_out / max_pool_size, 4) if max_pool_size else 0.0,
+            "waiting": self.waiting,
+            "maxWaiting": self.max_waiting,
+            "checkouts": self.checkouts,
+            "checkoutFailures": dict(self.checkout_failures),
+            "waitMs": {
+                "mean": round(self.wait_total_ms / self.waits, 3) if self.waits else 0.0,
+                "p50": round(_percentile(waits, 0.50), 3),
+                "p95": round(_percentile(waits, 0.95), 3),
+                "p99": round(_percentile(waits, 0.99), 3),
+                "max": round(self.wait_max_ms, 3),
+            },
+            "connectionsCreated": self.created,
+            "connectionsClosed": self.closed,
+            "closedReasons": dict(self.closed_reasons),
+            "poolCleared": self.cleared,
+        }
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self.started_at = time.time()
+        self._pools: Dict[str, PoolStats] = {}
+        self._lock = threading.Lock()
+        # Checkout start times of the current thread, by pool address.
+        # The started / checked-out events of one checkout share a thread.
+        self._local = threading.local()
+
+    def _pool(self, address) -> PoolStats:
+        key = "%s:%s" % address
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = PoolStats()
+        return pool
+
+    def _checkout_started(self, address) -> Optional[float]:
+        started = getattr(self._local, "started", None)
+        if started is None:
+            return None
+        return started.pop(address, None)
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.created += 1
+            pool.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.closed += 1
+            pool.open -= 1
+            pool.closed_reasons[event.reason] += 1
+
+    def connection_check_out_started(self, event):
+        if getattr(self._local, "started", None) is None:
+            self._local.started = {}
+        self._local.started[event.address] = time.perf_counter()
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting += 1
+            pool.max_waiting = max(pool.max_waiting, pool.waiting)
+
+    def connection_check_out_failed(self, event):
+        started = self._checkout_started(event.address)
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting -= 1
+            pool.checkout_failures[event.reason] += 1
+            if started is not None:
+                pool.record_wait((time.perf_counter() - started) * 1000)
+
+    def connection_checked_out(self, event):
+        started = self._checkout_started(event.address)
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting -= 1
+            pool.checkouts += 1
+            pool.checked_out += 1
+            pool.max_checked_out = max(pool.max_checked_out, pool.checked_out)
+            if started is not None:
+                pool.record_wait((time.perf_counter() - started) * 1000)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).checked_out -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = {address: pool.snapshot(self.max_pool_size) for address, pool in self._pools.items()}
+        return {
+            "maxPoolSize": self.max_pool_size,
+            "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+            "uptimeSeconds": round(time.time() - self.started_at, 1),
+            "pools": pools,
+        }
+
+
+pool_metrics = PoolMetrics(settings.MONGODB_MAX_POOL_SIZE)
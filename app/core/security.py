@@ -1,11 +1,16 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
+from concurrent.futures import ThreadPoolExecutor
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
+import argparse
+import asyncio
+import math
+import time
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hash."""
@@ -15,6 +20,80 @@ def get_password_hash(password: str) -> str:
     """Generate a password hash."""
     return pwd_context.hash(password)
 
+def get_hash_rounds(hashed_password: str) -> Optional[int]:
+    """Cost factor of a bcrypt hash ($2b$<rounds>$...)."""
+    try:
+        return int(hashed_password.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a stored hash was made with a different cost than configured."""
+    return get_hash_rounds(hashed_password) != settings.BCRYPT_ROUNDS
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a bounded thread pool so hashing never blocks the event
+    loop. bcrypt releases the GIL while hashing, so the pool size is the
+    number of hashes computed in parallel; further requests wait in line.
+    """
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.in_flight = 0
+        self.completed = 0
+
+    async def _run(self, fn: Callable, *args):
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "inFlight": self.in_flight,
+            "queued": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash without blocking the event loop."""
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate a password hash without blocking the event loop."""
+    return await password_hasher.hash(password)
+
+def calibrate_bcrypt_rounds(target_ms: float, samples: int = 3) -> int:
+    """
+    Pick the highest bcrypt cost whose hash time stays within target_ms on
+    this machine. Each extra round doubles the work, so a measurement at one
+    cost extrapolates to the others.
+    """
+    probe_rounds = 10
+    context = pwd_context.copy(bcrypt__rounds=probe_rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash("calibration-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    probe_ms = min(timings)
+    rounds = probe_rounds + math.floor(math.log2(target_ms / probe_ms))
+    return max(4, min(31, rounds))
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT token."""
     to_encode = data.copy()
@@ -28,3 +107,13 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
     
     return encoded_jwt
+
+if __name__ == "__main__":
+    # Calibrate once per hardware class and set BCRYPT_ROUNDS for every
+    # worker; per-worker calibration would make workers disagree on the
+    # cost and rehash passwords back and forth on login.
+    parser = argparse.ArgumentParser(description="Calibrate the bcrypt cost factor")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="target hash latency in milliseconds")
+    args = parser.parse_args()
+    rounds = calibrate_bcrypt_rounds(args.target_ms)
+    print(f"BCRYPT_ROUNDS={rounds}")
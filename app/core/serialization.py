@@ -0,0 +1,45 @@
+"""
+Response serialization.
+
+Routes build their payloads from plain dicts and models and return them in a
+FastJSONResponse. Returning a Response directly skips FastAPI's response_model
+validation and jsonable_encoder pass, and orjson encodes datetimes and nested
+models natively in a single pass. response_model declarations stay on the
+routes for the OpenAPI schema.
+"""
+from typing import Any, Dict, Iterable, List, Union
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.models.user import User, UserInDB
+
+# Fields of UserInDB never sent to clients
+PRIVATE_USER_FIELDS = {"password"}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        # pydantic-core's compiled serializer; datetimes stay native for orjson
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def public_user(user: Union[User, UserInDB]) -> Dict[str, Any]:
+    """Public view of a stored user (the User model's fields)"""
+    return user.model_dump(exclude=PRIVATE_USER_FIELDS)
+
+
+def public_users(users: Iterable[Union[User, UserInDB]]) -> List[Dict[str, Any]]:
+    return [user.model_dump(exclude=PRIVATE_USER_FIELDS) for user in users]
@@ -0,0 +1,223 @@
+"""
+Slow-query log.
+
+SlowQueryLog is a pymongo CommandListener. Commands that take at least
+SLOW_QUERY_THRESHOLD_MS are recorded with the repository method that issued
+them (taken from the @transactional / @analytics tag, see
+app.core.workload), the database, collection and command, with every filter,
+update and pipeline value replaced by a placeholder. Queries are then
+explained in the background on the event loop, and the entry gets the
+winning plan's stages and whether it scanned the whole collection.
+
+Entries go to a ring buffer of the last SLOW_QUERY_LOG_SIZE commands per
+worker, served newest first by GET /api/admin/system/slow-queries. A query
+shape (method, collection, command) is explained at most once per
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS; later entries reuse that plan.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import time
+
+from bson import json_util
+from bson.son import SON
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.core.workload import current_operation
+
+logger = logging.getLogger(__name__)
+
+# Commands explain accepts
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "findAndModify", "update", "delete"}
+
+# Session, transaction and routing fields: noise in the log, and rejected
+# (or meaningless) inside an explain
+_COMMAND_ENVELOPE = {
+    "lsid", "txnNumber", "autocommit", "startTransaction", "$clusterTime", "$db",
+    "$readPreference", "readConcern", "writeConcern", "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+
+
+def plan_stages(plan: Any) -> List[str]:
+    """Collect every stage name in an explain() plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+def winning_plan_stages(explanation: Any) -> List[str]:
+    """Stages of every winning plan in an explain result, pipelines included"""
+    stages = []
+    if isinstance(explanation, dict):
+        for key, value in explanation.items():
+            if key == "winningPlan":
+                stages.extend(plan_stages(value))
+            elif key != "rejectedPlans":
+                stages.extend(winning_plan_stages(value))
+    elif isinstance(explanation, list):
+        for item in explanation:
+            stages.extend(winning_plan_stages(item))
+    return stages
+
+
+# Command fields holding filters, updates and pipelines, whose values are
+# user data (emails, balances, password hashes)
+_DATA_FIELDS = {"filter", "query", "q", "update", "u", "pipeline", "updates", "deletes", "let"}
+
+# Keys inside those fields whose values are query structure, not data
+_STRUCTURAL_KEYS = {"$sort", "$limit", "$skip", "coll", "from", "as", "localField", "foreignField"}
+
+
+def _strip_envelope(command: Dict[str, Any]) -> SON:
+    return SON((key, value) for key, value in command.items() if key not in _COMMAND_ENVELOPE)
+
+
+def _redact(value: Any) -> Any:
+    """Keep field names and operators, replace every value with a placeholder"""
+    if isinstance(value, dict):
+        return {
+            key: item if key in _STRUCTURAL_KEYS else _redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(item, dict) for item in value):
+            return [_redact(item) for item in value]
+        return f"<{len(value)} values>"
+    return "?"
+
+
+def _loggable(command: Dict[str, Any]) -> Dict[str, Any]:
+    summary = _strip_envelope(command)
+    # Inserted documents can be large and are irrelevant to the plan
+    if "documents" in summary:
+        summary["documents"] = f"<{len(summary['documents'])} documents>"
+    # The first key names the command and holds the collection: "update"
+    # is a collection for an update command but data in findAndModify
+    name = next(iter(summary), None)
+    for field in _DATA_FIELDS.intersection(summary) - {name}:
+        summary[field] = _redact(summary[field])
+    return json.loads(json_util.dumps(summary, json_options=json_util.RELAXED_JSON_OPTIONS))
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float, size: int, explain_interval_seconds: float):
+        self.threshold_micros = threshold_ms * 1000
+        self.explain_interval_seconds = explain_interval_seconds
+        self.entries: deque = deque(maxlen=size)
+        self.recorded = 0
+        self._started: Dict[Tuple, Tuple[Dict[str, Any], str, Optional[str]]] = {}
+        self._plans: Dict[Tuple, Tuple[float, Dict[str, Any]]] = {}
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_micros > 0
+
+    def bind(self, client) -> None:
+        """Explain slow queries through this client on the running event loop"""
+        self._client = client
+        self._loop = asyncio.get_running_loop()
+
+    def started(self, event):
+        # Runs on the thread issuing the command, in the caller's context
+        self._started[(event.connection_id, event.request_id)] = (
+            event.command, event.database_name, current_operation()
+        )
+
+    def succeeded(self, event):
+        self._finished(event, None)
+
+    def failed(self, event):
+        # The code name rather than errmsg, which can quote values (the
+        # duplicate key of an E11000)
+        self._finished(event, str(event.failure.get("codeName", "")) or "failed")
+
+    def _finished(self, event, error: Optional[str]) -> None:
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < self.threshold_micros:
+            return
+        command, database, operation = started
+        name = event.command_name
+        collection = command.get("collection") if name == "getMore" else command.get(name)
+        entry = {
+            "timestamp": datetime.utcnow(),
+            "durationMs": round(event.duration_micros / 1000, 3),
+            "operation": operation,
+            "database": database,
+            "collection": collection if isinstance(collection, str) else None,
+            "command": name,
+            "error": error,
+            "details": _loggable(command),
+            "plan": None,
+        }
+        self.entries.append(entry)
+        self.recorded += 1
+
+        if name in EXPLAINABLE_COMMANDS and error is None and self._loop is not None:
+            key = (operation, database, entry["collection"], name)
+            recent = self._plans.get(key)
+            if recent and time.monotonic() - recent[0] < self.explain_interval_seconds:
+                entry["plan"] = recent[1]
+                return
+            # Entries of the same shape share this dict, which the explain
+            # fills in; reserving it keeps concurrent slow calls from each
+            # explaining the same shape
+            plan = entry["plan"] = {"pending": True}
+            self._plans[key] = (time.monotonic(), plan)
+            try:
+                self._loop.call_soon_threadsafe(self._schedule_explain, entry, database, command)
+            except RuntimeError:
+                # Event loop already closed (shutdown)
+                pass
+
+    def _schedule_explain(self, entry: Dict[str, Any], database: str, command: Dict[str, Any]) -> None:
+        self._loop.create_task(self._explain(entry, database, command))
+
+    async def _explain(self, entry: Dict[str, Any], database: str, command: Dict[str, Any]) -> None:
+        plan = entry["plan"]
+        try:
+            explanation = await self._client[database].command(
+                SON([("explain", _strip_envelope(command)), ("verbosity", "queryPlanner")])
+            )
+            stages = winning_plan_stages(explanation)
+            result = {"stages": stages, "collectionScan": "COLLSCAN" in stages}
+        except Exception as e:
+            result = {"error": str(e)}
+        result["explainedAt"] = datetime.utcnow()
+        plan.clear()
+        plan.update(result)
+        if plan.get("collectionScan"):
+            logger.warning(
+                f"Slow query scanned {entry['collection']}: {entry['operation']} took {entry['durationMs']} ms"
+            )
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        entries = list(reversed(self.entries))
+        return entries[:limit] if limit else entries
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "thresholdMs": self.threshold_micros / 1000,
+            "capacity": self.entries.maxlen,
+            "size": len(self.entries),
+            "recorded": self.recorded,
+        }
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS,
+    settings.SLOW_QUERY_LOG_SIZE,
+    settings.SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS
+)
@@ -0,0 +1,173 @@
+"""
+Lightweight request tracing.
+
+TracingMiddleware opens a root span per HTTP request. Inside it, span() and
+@traced open child spans: every repository method gets one through its
+@transactional / @analytics tag, service methods through @traced, and
+AuthService marks JWT decoding and bcrypt checks. Outside a request (CLIs,
+benchmarks) spans are no-ops.
+
+With TRACE_SAMPLE_RATE > 0, that fraction of requests writes its full span
+tree as one NDJSON record, to the file named by TRACE_OUTPUT or, when
+TRACE_OUTPUT is "memory", to a ring buffer of the last TRACE_BUFFER_SIZE
+traces served by GET /api/admin/system/traces.
+
+With SERVER_TIMING_HEADER (off by default), every response also carries a
+Server-Timing header with the total time and the summed duration and count
+of each span name, readable in the browser's network panel. The header goes
+to any client, and span names and timings reveal internals (whether a login
+ran a bcrypt check, i.e. whether the email exists), so it is meant for
+local profiling only.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import functools
+import random
+import time
+import uuid
+
+import orjson
+
+from app.core.config import settings
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "startMs": round((self.start - origin) * 1000, 3),
+            "durationMs": round(self.duration * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator wrapping an async function in a span (its qualified name by default)"""
+    def decorator(function: Callable) -> Callable:
+        label = name or function.__qualname__
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with span(label):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(root: Span) -> str:
+    totals: Dict[str, List[float]] = {}
+
+    def collect(node: Span) -> None:
+        for child in node.children:
+            total = totals.setdefault(child.name, [0.0, 0])
+            total[0] += child.duration
+            total[1] += 1
+            collect(child)
+
+    collect(root)
+    metrics = [f"total;dur={root.duration * 1000:.2f}"]
+    for name, (duration, count) in totals.items():
+        metrics.append(f'{name};dur={duration * 1000:.2f};desc="n={count}"')
+    return ", ".join(metrics)
+
+
+class TraceSink:
+    def __init__(self, output: str, size: int):
+        self.path = None if output == "memory" else output
+        self.buffer: deque = deque(maxlen=size)
+        self._file = None
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self.path is None:
+            self.buffer.append(record)
+            return
+        if self._file is None:
+            self._file = open(self.path, "ab", buffering=0)
+        # One unbuffered append per trace, so concurrent workers writing the
+        # same file do not interleave lines
+        self._file.write(orjson.dumps(record) + b"\n")
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        records = list(reversed(self.buffer))
+        return records[:limit] if limit else records
+
+
+trace_sink = TraceSink(settings.TRACE_OUTPUT, settings.TRACE_BUFFER_SIZE)
+
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root = Span(f"{scope['method']} {scope['path']}")
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_HEADER:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(root).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            root.end = time.perf_counter()
+            _current_span.reset(token)
+            if settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE:
+                route = scope.get("route")
+                record = {
+                    "traceId": uuid.uuid4().hex,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status_code,
+                    "durationMs": round(root.duration * 1000, 3),
+                    "spans": root.to_dict(root.start),
+                }
+                trace_sink.write(record)
@@ -0,0 +1,112 @@
+"""
+Read routing by workload.
+
+Repository methods are tagged either @transactional (money movement and a
+user's reads of their own data) or @analytics (admin dashboards, listings and
+reports). The tag is held in a context variable while the method runs, and
+each repository's collection is a RoutedCollection that sends transactional
+operations to the primary and analytics reads to a secondary when one is
+within ANALYTICS_MAX_STALENESS_SECONDS of the primary (SecondaryPreferred
+falls back to the primary otherwise). Untagged code runs as transactional.
+
+Trying it locally:
+
+    # single node: every read still goes to the primary
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+
+    # three nodes: analytics reads move to the secondaries
+    mongod --replSet rs0 --dbpath /tmp/rs0-0 --port 27017
+    mongod --replSet rs0 --dbpath /tmp/rs0-1 --port 27018
+    mongod --replSet rs0 --dbpath /tmp/rs0-2 --port 27019
+    mongosh --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"},
+        {_id: 1, host: "localhost:27018"},
+        {_id: 2, host: "localhost:27019"}]})'
+
+    MONGODB_URI="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0"
+
+The mongod logs (or db.currentOp() on each member) show where the admin
+queries run.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
+import functools
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.read_preferences import SecondaryPreferred
+
+from app.core.config import settings
+from app.core.tracing import span
+
+TRANSACTIONAL = "transactional"
+ANALYTICS = "analytics"
+
+_current_workload: ContextVar[str] = ContextVar("workload", default=TRANSACTIONAL)
+# Qualified name of the tagged repository method running, for diagnostics
+_current_operation: ContextVar[Optional[str]] = ContextVar("repository_operation", default=None)
+
+
+def current_workload() -> str:
+    return _current_workload.get()
+
+
+def current_operation() -> Optional[str]:
+    """The innermost tagged method running, e.g. 'UserRepository.get_all'"""
+    return _current_operation.get()
+
+
+@contextmanager
+def workload(name: str) -> Iterator[None]:
+    """Run the enclosed operations under the given workload"""
+    token = _current_workload.set(name)
+    try:
+        yield
+    finally:
+        _current_workload.reset(token)
+
+
+def _tag(name: str) -> Callable:
+    def decorator(method: Callable) -> Callable:
+        operation = method.__qualname__
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs):
+            token = _current_operation.set(operation)
+            try:
+                with workload(name), span(operation):
+                    return await method(*args, **kwargs)
+            finally:
+                _current_operation.reset(token)
+        wrapper.workload = name
+        return wrapper
+    return decorator
+
+
+analytics = _tag(ANALYTICS)
+transactional = _tag(TRANSACTIONAL)
+
+
+class RoutedCollection:
+    """
+    A Motor collection whose operations use the analytics read preference
+    while an @analytics method is running.
+
+    The read preference is bound when an operation (or cursor) is created, so
+    a cursor opened under one workload keeps it while it is iterated.
+    """
+
+    def __init__(self, collection: AsyncIOMotorCollection):
+        self.primary = collection
+        if settings.ANALYTICS_READ_FROM_SECONDARIES:
+            self.analytics = collection.with_options(
+                read_preference=SecondaryPreferred(max_staleness=settings.ANALYTICS_MAX_STALENESS_SECONDS)
+            )
+        else:
+            self.analytics = collection
+
+    def __getattr__(self, name: str) -> Any:
+        if _current_workload.get() == ANALYTICS:
+            return getattr(self.analytics, name)
+        return getattr(self.primary, name)
@@ -2,6 +2,7 @@ from pydantic import BaseModel, Field
 from typing import Optional, Literal
 from datetime import datetime
 from uuid import uuid4
+from app.core.config import settings
 
 class TransactionBase(BaseModel):
     amount: float
@@ -29,3 +30,28 @@ class TransactionsResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    nextCursor: Optional[str] = None
+
+class BatchTransferItem(BaseModel):
+    toAccount: str
+    amount: float
+    description: Optional[str] = None
+
+class BatchTransferCreate(BaseModel):
+    # Enforced while parsing, so an oversized batch is refused with a 422
+    transfers: list[BatchTransferItem] = Field(..., min_length=1, max_length=settings.BATCH_TRANSFER_MAX_ITEMS)
+
+class BatchTransferResult(BaseModel):
+    index: int
+    toAccount: str
+    amount: float
+    success: bool
+    message: str
+    transaction: Optional[Transaction] = None
+
+class BatchTransferResponse(BaseModel):
+    success: bool
+    message: str
+    completed: int
+    rejected: int
+    results: list[BatchTransferResult]
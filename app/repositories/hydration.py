@@ -0,0 +1,26 @@
+from typing import Any, Dict, Iterable, List, Type, TypeVar
+from pydantic import BaseModel
+from app.core.config import settings
+
+# Helpers for turning documents read back from our own collections into models.
+#
+# Everything in these collections was written from validated models, so by
+# default the repositories skip re-validation and build models with
+# model_construct. Set TRUSTED_HYDRATION=false to validate every document again
+# (e.g. while migrating data written by other tools).
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Projection dropping Mongo's ObjectId, which no model uses
+WITHOUT_ID = {"_id": 0}
+
+
+def hydrate(model: Type[ModelT], doc: Dict[str, Any]) -> ModelT:
+    if settings.TRUSTED_HYDRATION:
+        doc.pop("_id", None)
+        return model.model_construct(**doc)
+    return model(**doc)
+
+
+def hydrate_many(model: Type[ModelT], docs: Iterable[Dict[str, Any]]) -> List[ModelT]:
+    return [hydrate(model, doc) for doc in docs]
@@ -1,57 +1,119 @@
 from typing import Optional, List
 from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument
 from app.models.loan import Loan
+from app.core.pagination import apply_cursor
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.hydration import WITHOUT_ID, hydrate, hydrate_many
+from app.core.workload import RoutedCollection, analytics, transactional
 
 class LoanRepository:
+    # Indexes backing the lookups below; applied by app.core.migrations
+    INDEXES = [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("userId", ASCENDING), ("requestDate", DESCENDING)], name="userId_requestDate"),
+        IndexModel([("status", ASCENDING), ("requestDate", DESCENDING), ("id", DESCENDING)], name="status_requestDate_id"),
+        IndexModel([("requestDate", DESCENDING), ("id", DESCENDING)], name="requestDate_id"),
+    ]
+
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
-        self.collection = db.loans
+        self.collection = RoutedCollection(db.loans)
+        self.rollups = RollupRepository(db)
 
+    @transactional
     async def create(self, loan: Loan) -> Loan:
         loan_dict = loan.model_dump()
         await self.collection.insert_one(loan_dict)
+        await self.rollups.record_loan_status_change(loan, None, loan.status, loan.requestDate)
         return loan
 
+    @transactional
     async def get_by_id(self, loan_id: str) -> Optional[Loan]:
-        loan = await self.collection.find_one({"id": loan_id})
+        loan = await self.collection.find_one({"id": loan_id}, WITHOUT_ID)
         if loan:
-            return Loan(**loan)
+            return hydrate(Loan, loan)
         return None
 
+    @transactional
     async def get_by_user(self, user_id: str) -> List[Loan]:
-        loans = await self.collection.find({"userId": user_id}).to_list(length=100)
-        return [Loan(**loan) for loan in loans]
+        loans = await self.collection.find({"userId": user_id}, WITHOUT_ID).to_list(length=100)
+        return hydrate_many(Loan, loans)
+
+    @transactional
+    async def update_status(
+        self,
+        loan_id: str,
+        status: str,
+        expected_status: str,
+        session: Optional[AsyncIOMotorClientSession] = None,
+        record_rollup: bool = True
+    ) -> Optional[Loan]:
+        """
+        Move a loan from expected_status to status. Returns None, having
+        changed nothing, if the loan does not exist or is no longer in
+        expected_status, so of two concurrent decisions exactly one applies.
+        Callers inside a session transaction should pass record_rollup=False
+        and call record_status_change after commit.
+        """
+        loan = await self.collection.find_one({"id": loan_id}, WITHOUT_ID, session=session)
+        if not loan:
+            return None
+        loan = hydrate(Loan, loan)
 
-    async def update_status(self, loan_id: str, status: str) -> Optional[Loan]:
         update_data = {"status": status}
         
         if status == "approved":
             now = datetime.utcnow()
             update_data["approvalDate"] = now
-            
-            # Get loan to calculate due date
-            loan = await self.get_by_id(loan_id)
-            if loan:
-                # Calculate due date based on term
-                due_date = now + timedelta(days=loan.term * 30)  # Approximate months to days
-                update_data["dueDate"] = due_date
+            # Calculate due date based on term
+            due_date = now + timedelta(days=loan.term * 30)  # Approximate months to days
+            update_data["dueDate"] = due_date
+        elif status == "pending":
+            # Undoing an approval
+            update_data["approvalDate"] = None
+            update_data["dueDate"] = None
         
-        await self.collection.update_one(
-            {"id": loan_id},
-            {"$set": update_data}
+        updated = await self.collection.find_one_and_update(
+            {"id": loan_id, "status": expected_status},
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER,
+            session=session
         )
-        
-        return await self.get_by_id(loan_id)
+        if updated is None:
+            return None
+
+        if record_rollup:
+            await self.record_status_change(loan, expected_status, status)
+        return hydrate(Loan, updated)
+
+    @transactional
+    async def record_status_change(self, loan: Loan, old_status: str, new_status: str) -> None:
+        if old_status != new_status:
+            await self.rollups.record_loan_status_change(loan, old_status, new_status)
 
-    async def get_all(self, limit: int = 10, offset: int = 0, status: Optional[str] = None) -> List[Loan]:
+    @analytics
+    async def get_all(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        status: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> List[Loan]:
         query = {}
         if status:
             query["status"] = status
             
-        loans = await self.collection.find(query).skip(offset).limit(limit).to_list(length=limit)
-        return [Loan(**loan) for loan in loans]
+        # Newest first; (requestDate, id) is also the keyset pagination key
+        find = self.collection.find(apply_cursor(query, "requestDate", cursor), WITHOUT_ID)
+        find = find.sort([("requestDate", DESCENDING), ("id", DESCENDING)])
+        if not cursor:
+            find = find.skip(offset)
+        loans = await find.limit(limit).to_list(length=limit)
+        return hydrate_many(Loan, loans)
 
+    @analytics
     async def count(self, status: Optional[str] = None) -> int:
         query = {}
         if status:
@@ -59,18 +121,40 @@ class LoanRepository:
             
         return await self.collection.count_documents(query)
 
+    @analytics
     async def get_total_loans(self) -> int:
         return await self.collection.count_documents({})
         
+    @analytics
     async def get_loans_by_status(self, status: str) -> List[Loan]:
         """Get all loans with a specific status"""
         try:
-            loans = await self.collection.find({"status": status}).to_list(length=100)
-            return [Loan(**loan) for loan in loans]
+            loans = await self.collection.find({"status": status}, WITHOUT_ID).to_list(length=100)
+            return hydrate_many(Loan, loans)
         except Exception as e:
             print(f"Database error in get_loans_by_status: {e}")
             return []
             
+    @analytics
+    async def get_status_summary(self) -> dict:
+        """Exact loan count and amount per status, in one aggregation"""
+        try:
+            pipeline = [
+                {"$group": {
+                    "_id": "$status",
+                    "count": {"$sum": 1},
+                    "amount": {"$sum": "$amount"}
+                }}
+            ]
+            summary = {}
+            async for group in self.collection.aggregate(pipeline):
+                summary[group["_id"]] = {"count": group["count"], "amount": group["amount"]}
+            return summary
+        except Exception as e:
+            print(f"Database error in get_status_summary: {e}")
+            return {}
+
+    @analytics
     async def get_total_loan_amount(self) -> float:
         """Get the total amount of all loans"""
         try:
@@ -84,14 +168,3 @@ class LoanRepository:
         except Exception as e:
             print(f"Database error in get_total_loan_amount: {e}")
             return 0
-            
-    async def get_recent_loans(self, limit: int = 10) -> List[Loan]:
-        """
-        Get most recently created loans
-        """
-        try:
-            loans = await self.collection.find().sort("requestDate", -1).limit(limit).to_list(length=limit)
-            return [Loan(**loan) for loan in loans]
-        except Exception as e:
-            print(f"Database error in get_recent_loans: {e}")
-            return []
@@ -0,0 +1,215 @@
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+import uuid
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, IndexModel, UpdateOne
+from app.models.transaction import Transaction
+from app.models.user import UserInDB
+from app.models.loan import Loan
+from app.core.workload import RoutedCollection, analytics, transactional
+
+# Pre-aggregated analytics, one document per UTC day ("day:2024-05-01"), per
+# month ("month:2024-05") and one running total ("all"):
+#
+#   transactions.count / .volume / .byType.<type>.count / .byType.<type>.volume
+#   users.registered
+#   loans.byStatus.<status>.count / .amount
+#
+# loans.byStatus holds the net change in the number (and amount) of loans in
+# each status during the period: a new loan adds one "pending", an approval
+# moves one from "pending" to "approved". Summed over all periods, which is
+# what the "all" document holds, it is the current status distribution.
+#
+# Live updates only count what happens after they were deployed, so the
+# rollups cover all of history only once rebuild() has run; it marks the "all"
+# document with rebuiltAt.
+
+ALL_TIME_ID = "all"
+
+
+def _period_keys(moment: datetime) -> List[tuple]:
+    day_start = datetime(moment.year, moment.month, moment.day)
+    month_start = datetime(moment.year, moment.month, 1)
+    return [
+        (f"day:{day_start:%Y-%m-%d}", "day", day_start.strftime("%Y-%m-%d"), day_start),
+        (f"month:{month_start:%Y-%m}", "month", month_start.strftime("%Y-%m"), month_start),
+        (ALL_TIME_ID, "all", "all", None),
+    ]
+
+
+def _transaction_increments(transaction: Transaction) -> Dict[str, float]:
+    return {
+        "transactions.count": 1,
+        "transactions.volume": transaction.amount,
+        f"transactions.byType.{transaction.type}.count": 1,
+        f"transactions.byType.{transaction.type}.volume": transaction.amount,
+    }
+
+
+class RollupRepository:
+    INDEXES = [
+        IndexModel([("period", ASCENDING), ("start", ASCENDING)], name="period_start"),
+    ]
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.collection = RoutedCollection(db.analytics_rollups)
+
+    async def _increment(self, moment: datetime, increments: Dict[str, float]) -> None:
+        await self._apply({key: increments for key in _period_keys(moment)})
+
+    async def _apply(self, periods: Dict[tuple, Dict[str, float]]) -> None:
+        # Every affected day, month and all-time document in one round trip
+        operations = [
+            UpdateOne(
+                {"_id": _id},
+                {
+                    "$inc": increments,
+                    "$setOnInsert": {"period": period, "date": date, "start": start}
+                },
+                upsert=True
+            )
+            for (_id, period, date, start), increments in periods.items()
+        ]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            # Rollups are derived data; `python -m app.core.migrations rebuild-rollups` repairs drift
+            print(f"Database error in rollup update: {e}")
+
+    @transactional
+    async def record_transaction(self, transaction: Transaction) -> None:
+        await self._increment(transaction.timestamp, _transaction_increments(transaction))
+
+    @transactional
+    async def record_transactions(self, transactions: List[Transaction]) -> None:
+        """Count a batch of transactions with one update per affected period"""
+        periods: Dict[tuple, Dict[str, float]] = {}
+        for transaction in transactions:
+            for key in _period_keys(transaction.timestamp):
+                increments = periods.setdefault(key, {})
+                for field, value in _transaction_increments(transaction).items():
+                    increments[field] = increments.get(field, 0) + value
+        if periods:
+            await self._apply(periods)
+
+    @transactional
+    async def record_user_registered(self, user: UserInDB) -> None:
+        await self._increment(user.createdAt, {"users.registered": 1})
+
+    @transactional
+    async def record_loan_status_change(
+        self,
+        loan: Loan,
+        old_status: Optional[str],
+        new_status: str,
+        moment: Optional[datetime] = None
+    ) -> None:
+        increments = {
+            f"loans.byStatus.{new_status}.count": 1,
+            f"loans.byStatus.{new_status}.amount": loan.amount,
+        }
+        if old_status:
+            increments[f"loans.byStatus.{old_status}.count"] = -1
+            increments[f"loans.byStatus.{old_status}.amount"] = -loan.amount
+        await self._increment(moment or datetime.utcnow(), increments)
+
+    @analytics
+    async def get_all_time(self) -> Dict[str, Any]:
+        return await self.collection.find_one({"_id": ALL_TIME_ID}) or {}
+
+    @analytics
+    async def is_rebuilt(self) -> bool:
+        """Whether the rollups were rebuilt from history, and so cover all of it"""
+        marker = await self.collection.find_one({"_id": ALL_TIME_ID, "rebuiltAt": {"$exists": True}}, {"_id": 1})
+        return marker is not None
+
+    @analytics
+    async def get_range(self, period: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
+        """Rollup documents of a period type whose start lies in [start_date, end_date)"""
+        query = {"period": period, "start": {"$gte": start_date, "$lt": end_date}}
+        return await self.collection.find(query).sort("start", 1).to_list(length=None)
+
+    @transactional
+    async def rebuild(self) -> int:
+        """
+        Recompute every rollup document from the raw collections and return
+        the number of documents written. Loan history is not stored, so each
+        loan's current status is attributed to its approval (or request) day.
+
+        The documents are written to a staging collection that then replaces
+        analytics_rollups with renameCollection, so readers never see a
+        partial set and live upserts never collide with the load. Increments
+        recorded between the aggregations and the swap go to the replaced
+        collection and are lost: run it in a maintenance window, through
+        `python -m app.core.migrations rebuild-rollups`.
+        """
+        docs: Dict[str, Dict[str, Any]] = {}
+
+        def add(moment: datetime, increments: Dict[str, float]) -> None:
+            for _id, period, date, start in _period_keys(moment):
+                doc = docs.setdefault(_id, {"_id": _id, "period": period, "date": date, "start": start})
+                for path, value in increments.items():
+                    target = doc
+                    *parents, leaf = path.split(".")
+                    for key in parents:
+                        target = target.setdefault(key, {})
+                    target[leaf] = target.get(leaf, 0) + value
+
+        day = {"$dateToString": {"date": "$timestamp", "format": "%Y-%m-%d"}}
+        transaction_pipeline = [
+            {"$group": {
+                "_id": {"day": day, "type": "$type"},
+                "count": {"$sum": 1},
+                "volume": {"$sum": "$amount"}
+            }}
+        ]
+        async for group in self.db.transactions.aggregate(transaction_pipeline, allowDiskUse=True):
+            type_name = group["_id"]["type"]
+            add(datetime.strptime(group["_id"]["day"], "%Y-%m-%d"), {
+                "transactions.count": group["count"],
+                "transactions.volume": group["volume"],
+                f"transactions.byType.{type_name}.count": group["count"],
+                f"transactions.byType.{type_name}.volume": group["volume"],
+            })
+
+        user_pipeline = [
+            {"$group": {
+                "_id": {"$dateToString": {"date": "$createdAt", "format": "%Y-%m-%d"}},
+                "count": {"$sum": 1}
+            }}
+        ]
+        async for group in self.db.users.aggregate(user_pipeline, allowDiskUse=True):
+            add(datetime.strptime(group["_id"], "%Y-%m-%d"), {"users.registered": group["count"]})
+
+        loan_day = {"$dateToString": {"date": {"$ifNull": ["$approvalDate", "$requestDate"]}, "format": "%Y-%m-%d"}}
+        loan_pipeline = [
+            {"$group": {
+                "_id": {"day": loan_day, "status": "$status"},
+                "count": {"$sum": 1},
+                "amount": {"$sum": "$amount"}
+            }}
+        ]
+        async for group in self.db.loans.aggregate(loan_pipeline, allowDiskUse=True):
+            status = group["_id"]["status"]
+            add(datetime.strptime(group["_id"]["day"], "%Y-%m-%d"), {
+                f"loans.byStatus.{status}.count": group["count"],
+                f"loans.byStatus.{status}.amount": group["amount"],
+            })
+
+        # Written even for an empty database, so readers know the rollups are complete
+        for _id, period, date, start in _period_keys(datetime.utcnow()):
+            if _id == ALL_TIME_ID:
+                docs.setdefault(_id, {"_id": _id, "period": period, "date": date, "start": start})
+        docs[ALL_TIME_ID]["rebuiltAt"] = datetime.utcnow()
+
+        target = self.db.analytics_rollups.name
+        staging = self.db[f"{target}_rebuild_{uuid.uuid4().hex[:8]}"]
+        try:
+            await staging.insert_many(list(docs.values()), ordered=False)
+            await staging.create_indexes(self.INDEXES)
+            await staging.rename(target, dropTarget=True)
+        except Exception:
+            await staging.drop()
+            raise
+        return len(docs)
@@ -1,33 +1,166 @@
-from typing import Optional, List
-from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import AsyncIterator, Optional, List
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClientSession, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from app.models.transaction import Transaction
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.hydration import WITHOUT_ID, hydrate, hydrate_many
+from app.core.pagination import apply_cursor
+from app.core.workload import ANALYTICS, TRANSACTIONAL, RoutedCollection, analytics, transactional, workload
+
+# Listing order; (timestamp, id) is also the keyset pagination key
+HISTORY_SORT = [("timestamp", DESCENDING), ("id", DESCENDING)]
+
+
+def recent_activity_pipeline(limit: int, loans_collection: str = "loans") -> List[dict]:
+    """
+    Latest transactions and loan applications, merged newest first. Each side
+    is cut to limit from its own time index before the union.
+    """
+    return [
+        {"$sort": {"timestamp": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "_id": 0, "id": 1, "kind": {"$literal": "transaction"}, "type": 1, "amount": 1,
+            "status": 1, "timestamp": 1, "fromAccount": 1, "toAccount": 1
+        }},
+        {"$unionWith": {
+            "coll": loans_collection,
+            "pipeline": [
+                {"$sort": {"requestDate": -1}},
+                {"$limit": limit},
+                {"$project": {
+                    "_id": 0, "id": 1, "kind": {"$literal": "loan"}, "amount": 1,
+                    "status": 1, "timestamp": "$requestDate", "userId": 1
+                }}
+            ]
+        }},
+        {"$sort": {"timestamp": -1}},
+        {"$limit": limit}
+    ]
 
 class TransactionRepository:
+    # Indexes backing the lookups below; applied by app.core.migrations.
+    # Account history is an $or over both legs, so each leg gets its own
+    # index and the server merges them in timestamp order.
+    INDEXES = [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("fromAccount", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="fromAccount_timestamp_id"),
+        IndexModel([("toAccount", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="toAccount_timestamp_id"),
+        IndexModel([("type", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], name="type_timestamp_id"),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)], name="timestamp_id"),
+    ]
+
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
-        self.collection = db.transactions
+        self.collection = RoutedCollection(db.transactions)
+        self.rollups = RollupRepository(db)
 
-    async def create(self, transaction: Transaction) -> Transaction:
+    @transactional
+    async def create(
+        self,
+        transaction: Transaction,
+        session: Optional[AsyncIOMotorClientSession] = None,
+        record_rollup: bool = True
+    ) -> Transaction:
+        """
+        Insert a transaction and count it in the analytics rollups. Callers
+        inside a session transaction should pass record_rollup=False and call
+        record_rollup after commit, so every transfer does not hold locks on
+        the shared rollup documents for the length of its transaction.
+        """
         transaction_dict = transaction.model_dump()
-        await self.collection.insert_one(transaction_dict)
+        await self.collection.insert_one(transaction_dict, session=session)
+        if record_rollup:
+            await self.rollups.record_transaction(transaction)
         return transaction
 
+    @transactional
+    async def create_many(
+        self,
+        transactions: List[Transaction],
+        session: Optional[AsyncIOMotorClientSession] = None
+    ) -> List[Transaction]:
+        """Insert transactions in one unordered insert_many; rollups are left to record_rollups"""
+        if transactions:
+            await self.collection.insert_many(
+                [transaction.model_dump() for transaction in transactions],
+                ordered=False,
+                session=session
+            )
+        return transactions
+
+    @transactional
+    async def record_rollup(self, transaction: Transaction) -> None:
+        await self.rollups.record_transaction(transaction)
+
+    @transactional
+    async def record_rollups(self, transactions: List[Transaction]) -> None:
+        await self.rollups.record_transactions(transactions)
+
+    @transactional
     async def get_by_id(self, transaction_id: str) -> Optional[Transaction]:
-        transaction = await self.collection.find_one({"id": transaction_id})
+        transaction = await self.collection.find_one({"id": transaction_id}, WITHOUT_ID)
         if transaction:
-            return Transaction(**transaction)
+            return hydrate(Transaction, transaction)
         return None
 
-    async def get_by_account(self, account_number: str, limit: int = 10, offset: int = 0) -> List[Transaction]:
+    @transactional
+    async def get_by_account(
+        self,
+        account_number: str,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> List[Transaction]:
         query = {
             "$or": [
                 {"fromAccount": account_number},
                 {"toAccount": account_number}
             ]
         }
-        transactions = await self.collection.find(query).sort("timestamp", -1).skip(offset).limit(limit).to_list(length=limit)
-        return [Transaction(**tx) for tx in transactions]
+        find = self.collection.find(apply_cursor(query, "timestamp", cursor), WITHOUT_ID).sort(HISTORY_SORT)
+        if not cursor:
+            find = find.skip(offset)
+        transactions = await find.limit(limit).to_list(length=limit)
+        return hydrate_many(Transaction, transactions)
 
+    async def stream(
+        self,
+        account_number: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        type: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> AsyncIterator[dict]:
+        """
+        Iterate matching transactions oldest first straight off the cursor,
+        fetching batch_size documents per round trip
+        """
+        query = {}
+        if account_number:
+            query["$or"] = [
+                {"fromAccount": account_number},
+                {"toAccount": account_number}
+            ]
+        if start_date or end_date:
+            query["timestamp"] = {}
+            if start_date:
+                query["timestamp"]["$gte"] = start_date
+            if end_date:
+                query["timestamp"]["$lt"] = end_date
+        if type:
+            query["type"] = type
+
+        # An export of one account is that user's own history; a full export
+        # is an admin report. The cursor keeps the read preference it was
+        # opened with.
+        with workload(TRANSACTIONAL if account_number else ANALYTICS):
+            cursor = self.collection.find(query, WITHOUT_ID, batch_size=batch_size)
+        async for transaction in cursor.sort([("timestamp", ASCENDING), ("id", ASCENDING)]):
+            yield transaction
+
+    @transactional
     async def count_by_account(self, account_number: str) -> int:
         query = {
             "$or": [
@@ -37,14 +170,25 @@ class TransactionRepository:
         }
         return await self.collection.count_documents(query)
 
-    async def get_all(self, limit: int = 10, offset: int = 0, type: Optional[str] = None) -> List[Transaction]:
+    @analytics
+    async def get_all(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        type: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> List[Transaction]:
         query = {}
         if type:
             query["type"] = type
             
-        transactions = await self.collection.find(query).sort("timestamp", -1).skip(offset).limit(limit).to_list(length=limit)
-        return [Transaction(**tx) for tx in transactions]
+        find = self.collection.find(apply_cursor(query, "timestamp", cursor), WITHOUT_ID).sort(HISTORY_SORT)
+        if not cursor:
+            find = find.skip(offset)
+        transactions = await find.limit(limit).to_list(length=limit)
+        return hydrate_many(Transaction, transactions)
 
+    @analytics
     async def count(self, type: Optional[str] = None) -> int:
         query = {}
         if type:
@@ -52,9 +196,45 @@ class TransactionRepository:
             
         return await self.collection.count_documents(query)
 
+    @analytics
     async def get_total_transactions(self) -> int:
         return await self.collection.count_documents({})
         
+    @analytics
+    async def get_totals(self) -> dict:
+        """Exact transaction count and total volume, in one pass"""
+        try:
+            pipeline = [
+                {"$group": {"_id": None, "count": {"$sum": 1}, "volume": {"$sum": "$amount"}}}
+            ]
+            result = await self.collection.aggregate(pipeline).to_list(length=1)
+            if not result:
+                return {"count": 0, "volume": 0}
+            return {"count": result[0]["count"], "volume": result[0]["volume"]}
+        except Exception as e:
+            print(f"Database error in get_totals: {e}")
+            return {"count": 0, "volume": 0}
+
+    @analytics
+    async def get_type_summary(self) -> dict:
+        """Exact transaction count and volume per type, in one aggregation"""
+        try:
+            pipeline = [
+                {"$group": {
+                    "_id": "$type",
+                    "count": {"$sum": 1},
+                    "volume": {"$sum": "$amount"}
+                }}
+            ]
+            summary = {}
+            async for group in self.collection.aggregate(pipeline):
+                summary[group["_id"]] = {"count": group["count"], "volume": group["volume"]}
+            return summary
+        except Exception as e:
+            print(f"Database error in get_type_summary: {e}")
+            return {}
+
+    @analytics
     async def get_total_volume(self) -> float:
         """Get the total volume of all transactions"""
         try:
@@ -69,27 +249,49 @@ class TransactionRepository:
             print(f"Database error in get_total_volume: {e}")
             return 0
             
-    async def get_transactions_in_date_range(self, start_date, end_date) -> List[Transaction]:
-        """Get all transactions between start_date and end_date"""
-        query = {
-            "createdAt": {
-                "$gte": start_date,
-                "$lte": end_date
-            }
-        }
-        
+    @analytics
+    async def get_daily_totals(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        timezone: str = "UTC",
+        by_type: bool = False
+    ) -> List[dict]:
+        """
+        Count and volume per calendar day (in timezone) for transactions in
+        [start_date, end_date), optionally split by transaction type
+        """
+        day = {"$dateTrunc": {"date": "$timestamp", "unit": "day", "timezone": timezone}}
+        group_id = {"date": {"$dateToString": {"date": day, "format": "%Y-%m-%d", "timezone": timezone}}}
+        if by_type:
+            group_id["type"] = "$type"
+
+        pipeline = [
+            {"$match": {"timestamp": {"$gte": start_date, "$lt": end_date}}},
+            {"$group": {
+                "_id": group_id,
+                "count": {"$sum": 1},
+                "volume": {"$sum": "$amount"}
+            }}
+        ]
         try:
-            transactions = await self.collection.find(query).sort("createdAt", 1).to_list(length=1000)
-            return [Transaction(**tx) for tx in transactions]
+            rows = []
+            async for group in self.collection.aggregate(pipeline):
+                rows.append({**group["_id"], "count": group["count"], "volume": group["volume"]})
+            return rows
         except Exception as e:
-            print(f"Database error in get_transactions_in_date_range: {e}")
+            print(f"Database error in get_daily_totals: {e}")
             return []
-
-    async def get_recent_transactions(self, limit: int = 10) -> List[Transaction]:
-        """Get the most recent transactions"""
+            
+    @analytics
+    async def get_recent_activity(self, limit: int = 10) -> List[dict]:
+        """
+        Most recent transactions and loan applications merged by time at the
+        database, in one round trip regardless of history size
+        """
+        pipeline = recent_activity_pipeline(limit, self.db.loans.name)
         try:
-            transactions = await self.collection.find().sort("createdAt", -1).limit(limit).to_list(length=limit)
-            return [Transaction(**tx) for tx in transactions]
+            return await self.collection.aggregate(pipeline).to_list(length=limit)
         except Exception as e:
-            print(f"Database error in get_recent_transactions: {e}")
+            print(f"Database error in get_recent_activity: {e}")
             return []
@@ -1,64 +1,131 @@
-from typing import Optional, List
+from typing import Optional, List, Dict
 from fastapi import Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.models.user import UserInDB, UserProfileUpdate
-from app.core.security import get_password_hash
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.models.user import User, UserInDB, UserProfileUpdate
+from app.core.account_numbers import generate_account_number
+from app.core.pagination import apply_cursor
+from app.core.security import get_password_hash_async
+from app.core.cache import user_cache
+from app.repositories.rollup_repository import RollupRepository
+from app.repositories.hydration import WITHOUT_ID, hydrate
 from app.core.database import get_database
-import uuid
+from app.core.workload import RoutedCollection, analytics, transactional
 from datetime import datetime
 
+# Fields needed to label a user in listings and activity feeds
+SUMMARY_PROJECTION = {"_id": 0, "id": 1, "accountNumber": 1, "firstName": 1, "lastName": 1}
+# Everything but the password hash, for listings
+PUBLIC_PROJECTION = {"_id": 0, "password": 0}
+# Fresh account numbers drawn per registration before giving up; with a
+# billion possible numbers, a retry is rare until the space is well filled
+ACCOUNT_NUMBER_ATTEMPTS = 10
+
+class EmailAlreadyRegistered(Exception):
+    """Raised when a write would give a second user the same email."""
+
 class UserRepository:
+    # Indexes backing the lookups below; applied by app.core.migrations
+    INDEXES = [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("accountNumber", ASCENDING)], name="accountNumber_unique", unique=True),
+        IndexModel([("createdAt", DESCENDING), ("id", DESCENDING)], name="createdAt_id"),
+    ]
+
     def __init__(self, db: AsyncIOMotorDatabase = Depends(get_database)):
         self.db = db
-        self.collection = db.users
+        self.collection = RoutedCollection(db.users)
+        self.rollups = RollupRepository(db)
 
     async def _get_by_field(self, field: str, value: str) -> Optional[UserInDB]:
         try:
-            user = await self.collection.find_one({field: value})
+            user = await self.collection.find_one({field: value}, WITHOUT_ID)
             if user:
-                return UserInDB(**user)
+                return hydrate(UserInDB, user)
             return None
         except Exception as e:
             print(f"Database error: {e}")
             return None
 
+    @transactional
     async def get_by_id(self, user_id: str) -> Optional[UserInDB]:
         return await self._get_by_field("id", user_id)
 
+    @analytics
+    async def get_summaries(self, user_ids: List[str] = (), account_numbers: List[str] = ()) -> List[dict]:
+        """Account number and name of users matching any id or account number, in one query"""
+        clauses = []
+        if user_ids:
+            clauses.append({"id": {"$in": list(set(user_ids))}})
+        if account_numbers:
+            clauses.append({"accountNumber": {"$in": list(set(account_numbers))}})
+        if not clauses:
+            return []
+        try:
+            query = clauses[0] if len(clauses) == 1 else {"$or": clauses}
+            return await self.collection.find(query, SUMMARY_PROJECTION).to_list(length=None)
+        except Exception as e:
+            print(f"Database error: {e}")
+            return []
+
+    @analytics
+    async def get_summaries_by_ids(self, user_ids: List[str]) -> Dict[str, dict]:
+        """Account number and name of each user, keyed by id, in one $in query"""
+        return {user["id"]: user for user in await self.get_summaries(user_ids=user_ids)}
+
+    @transactional
     async def get_by_email(self, email: str) -> Optional[UserInDB]:
         return await self._get_by_field("email", email)
 
+    @transactional
     async def get_by_account_number(self, account_number: str) -> Optional[UserInDB]:
         return await self._get_by_field("accountNumber", account_number)
 
+    async def _duplicate_field(self, error: DuplicateKeyError, user: UserInDB) -> str:
+        """The unique field (email or accountNumber) an insert collided on"""
+        key_pattern = (error.details or {}).get("keyPattern") or {}
+        for field in ("email", "accountNumber"):
+            if field in key_pattern or f"{field}_unique" in str(error):
+                return field
+        # keyPattern missing: only this failure path pays for the lookup
+        return "email" if await self.get_by_email(user.email) else "accountNumber"
+
+    @transactional
     async def create(self, user_data: dict) -> UserInDB:
+        """
+        Insert a new user in one round trip. The unique indexes reject a taken
+        email (raised as EmailAlreadyRegistered) or account number (drawn
+        again).
+        """
         try:
-            # Generate account number
-            while True:
-                account_number = str(uuid.uuid4().int)[:10]
-                existing_user = await self.get_by_account_number(account_number)
-                if not existing_user:
-                    break
-
-            hashed_password = get_password_hash(user_data["password"])
+            hashed_password = await get_password_hash_async(user_data["password"])
             user_data.pop("password")
 
-            # Create user object
-            user = UserInDB(
-                **user_data,
-                accountNumber=account_number,
-                password=hashed_password
-            )
-            
-            # Insert into database
-            user_dict = user.model_dump()
-            await self.collection.insert_one(user_dict)
-            
-            return user
+            for _ in range(ACCOUNT_NUMBER_ATTEMPTS):
+                user = UserInDB(
+                    **user_data,
+                    accountNumber=generate_account_number(),
+                    password=hashed_password
+                )
+                try:
+                    await self.collection.insert_one(user.model_dump())
+                except DuplicateKeyError as e:
+                    if await self._duplicate_field(e, user) == "email":
+                        raise EmailAlreadyRegistered(user.email)
+                    continue
+                await self.rollups.record_user_registered(user)
+                return user
+        except EmailAlreadyRegistered:
+            raise
         except Exception as e:
             print(f"Database error: {e}")
             return None
+        raise RuntimeError(f"No free account number after {ACCOUNT_NUMBER_ATTEMPTS} attempts")
 
+    @transactional
     async def update(self, user_id: str, update_data: UserProfileUpdate) -> Optional[UserInDB]:
         try:
             # Filter out None values
@@ -67,11 +134,13 @@ class UserRepository:
             if not update_dict:
                 return await self.get_by_id(user_id)
 
-            # Update user
+            # Update user. An email already in use fails on the unique email
+            # index (DuplicateKeyError) and returns None below.
             result = await self.collection.update_one(
                 {"id": user_id},
                 {"$set": update_dict}
             )
+            user_cache.invalidate(user_id)
 
             if result.modified_count > 0:
                 return await self.get_by_id(user_id)
@@ -81,31 +150,145 @@ class UserRepository:
             print(f"Database error: {e}")
             return None
 
-    async def update_balance(self, user_id: str, new_balance: float) -> Optional[UserInDB]:
+    @transactional
+    async def update_password(self, user_id: str, hashed_password: str) -> bool:
         try:
             result = await self.collection.update_one(
                 {"id": user_id},
-                {"$set": {"balance": new_balance}}
+                {"$set": {"password": hashed_password}}
             )
-            if result.modified_count > 0:
-                return await self.get_by_id(user_id)
-            else:
-                return None
+            user_cache.invalidate(user_id)
+            return result.modified_count > 0
+        except Exception as e:
+            print(f"Database error: {e}")
+            return False
+
+    @transactional
+    async def update_balance(self, user_id: str, new_balance: float) -> Optional[UserInDB]:
+        try:
+            user = await self.collection.find_one_and_update(
+                {"id": user_id},
+                {"$set": {"balance": new_balance}},
+                return_document=ReturnDocument.AFTER
+            )
+            user_cache.invalidate(user_id)
+            if user:
+                return hydrate(UserInDB, user)
+            return None
         except Exception as e:
             print(f"Database error: {e}")
             return None
 
-    async def get_all(self, limit: int = 10, offset: int = 0) -> List[UserInDB]:
+    # The balance adjustments below are single conditional $inc round trips
+    # that return the updated document. They raise on database errors so a
+    # surrounding session transaction can abort or retry. Cached users are
+    # invalidated even if a surrounding transaction later aborts; that only
+    # costs a cache miss.
+
+    @transactional
+    async def debit(
+        self,
+        user_id: str,
+        amount: float,
+        session: Optional[AsyncIOMotorClientSession] = None
+    ) -> Optional[UserInDB]:
+        """Withdraw amount if the balance covers it; None if the user is missing or short of funds."""
+        user = await self.collection.find_one_and_update(
+            {"id": user_id, "balance": {"$gte": amount}},
+            {"$inc": {"balance": -amount}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        user_cache.invalidate(user_id)
+        if user:
+            return hydrate(UserInDB, user)
+        return None
+
+    @transactional
+    async def credit(
+        self,
+        user_id: str,
+        amount: float,
+        session: Optional[AsyncIOMotorClientSession] = None
+    ) -> Optional[UserInDB]:
+        user = await self.collection.find_one_and_update(
+            {"id": user_id},
+            {"$inc": {"balance": amount}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        user_cache.invalidate(user_id)
+        if user:
+            return hydrate(UserInDB, user)
+        return None
+
+    @transactional
+    async def credit_account(
+        self,
+        account_number: str,
+        amount: float,
+        session: Optional[AsyncIOMotorClientSession] = None
+    ) -> Optional[UserInDB]:
+        user = await self.collection.find_one_and_update(
+            {"accountNumber": account_number},
+            {"$inc": {"balance": amount}},
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if user:
+            user_cache.invalidate(user["id"])
+            return hydrate(UserInDB, user)
+        return None
+
+    @transactional
+    async def get_ids_by_account_numbers(
+        self,
+        account_numbers: List[str],
+        session: Optional[AsyncIOMotorClientSession] = None
+    ) -> Dict[str, str]:
+        """User id of each existing account number, in one $in query"""
+        users = await self.collection.find(
+            {"accountNumber": {"$in": list(set(account_numbers))}},
+            {"_id": 0, "id": 1, "accountNumber": 1},
+            session=session
+        ).to_list(length=None)
+        return {user["accountNumber"]: user["id"] for user in users}
+
+    @transactional
+    async def credit_many(
+        self,
+        amounts: Dict[str, float],
+        session: Optional[AsyncIOMotorClientSession] = None
+    ) -> int:
+        """Add amounts[user_id] to each user's balance in one bulk write; returns the number of users matched."""
+        if not amounts:
+            return 0
+        result = await self.collection.bulk_write(
+            [UpdateOne({"id": user_id}, {"$inc": {"balance": amount}}) for user_id, amount in amounts.items()],
+            ordered=False,
+            session=session
+        )
+        for user_id in amounts:
+            user_cache.invalidate(user_id)
+        return result.matched_count
+
+    @analytics
+    async def get_all(self, limit: int = 10, offset: int = 0, cursor: Optional[str] = None) -> List[User]:
+        # Newest first; (createdAt, id) is also the keyset pagination key
+        query = apply_cursor({}, "createdAt", cursor)
         try:
             users = []
-            cursor = self.collection.find().skip(offset).limit(limit)
-            async for user in cursor:
-                users.append(UserInDB(**user))
+            find = self.collection.find(query, PUBLIC_PROJECTION).sort([("createdAt", DESCENDING), ("id", DESCENDING)])
+            if not cursor:
+                find = find.skip(offset)
+            async for user in find.limit(limit):
+                users.append(hydrate(User, user))
             return users
         except Exception as e:
             print(f"Database error: {e}")
             return []
 
+    @analytics
     async def count(self) -> int:
         try:
             return await self.collection.count_documents({})
@@ -113,9 +296,11 @@ class UserRepository:
             print(f"Database error: {e}")
             return 0
 
+    @analytics
     async def get_total_users(self) -> int:
         return await self.collection.count_documents({})
         
+    @analytics
     async def get_active_users_count(self) -> int:
         """Get count of active users (users who logged in within the last 30 days)"""
         try:
@@ -127,23 +312,46 @@ class UserRepository:
             print(f"Database error: {e}")
             return 0
             
-    async def get_users_registered_in_range(self, start_date: datetime, end_date: datetime) -> List[UserInDB]:
+    @analytics
+    async def get_user_counts(self) -> dict:
+        """Exact total of users and the active-user estimate"""
+        try:
+            # count_documents rather than the metadata estimate, which can
+            # drift after an unclean shutdown and counts orphans on sharded
+            # clusters
+            total = await self.collection.count_documents({})
+            # Same placeholder as get_active_users_count until logins are tracked
+            return {"total": total, "active": int(total * 0.8)}
+        except Exception as e:
+            print(f"Database error: {e}")
+            return {"total": 0, "active": 0}
+            
+    @analytics
+    async def get_monthly_registrations(self, start_date: datetime, end_date: datetime) -> dict:
         """
-        Get users who registered between start_date and end_date
+        Number of users registered per month ("YYYY-MM") between start_date
+        and end_date, counted on the server over the createdAt index
         """
+        pipeline = [
+            {"$match": {"createdAt": {"$gte": start_date, "$lte": end_date}}},
+            {"$group": {
+                "_id": {"$dateToString": {"date": "$createdAt", "format": "%Y-%m"}},
+                "count": {"$sum": 1}
+            }}
+        ]
         try:
-            query = {
-                "createdAt": {
-                    "$gte": start_date,
-                    "$lte": end_date
-                }
-            }
-            
-            users = []
-            cursor = self.collection.find(query).sort("createdAt", 1)
-            async for user in cursor:
-                users.append(UserInDB(**user))
-            return users
+            counts = {}
+            async for group in self.collection.aggregate(pipeline):
+                counts[group["_id"]] = group["count"]
+            return counts
         except Exception as e:
-            print(f"Database error in get_users_registered_in_range: {e}")
-            return []
+            print(f"Database error in get_monthly_registrations: {e}")
+            return {}
+
+    @analytics
+    async def count_registered_before(self, date: datetime) -> int:
+        try:
+            return await self.collection.count_documents({"createdAt": {"$lt": date}})
+        except Exception as e:
+            print(f"Database error: {e}")
+            return 0
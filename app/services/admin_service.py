@@ -2,93 +2,152 @@ from fastapi import Depends
 from app.repositories.user_repository import UserRepository
 from app.repositories.transaction_repository import TransactionRepository
 from app.repositories.loan_repository import LoanRepository
-from datetime import datetime, timedelta
+from app.repositories.rollup_repository import RollupRepository
+from app.models.transaction import Transaction
+from app.models.loan import Loan
+from app.core.config import settings
+from app.core.tracing import traced
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from typing import Optional, get_args
+from zoneinfo import ZoneInfo
+import asyncio
+
+TRANSACTION_TYPES = get_args(Transaction.model_fields["type"].annotation)
+LOAN_STATUSES = get_args(Loan.model_fields["status"].annotation)
 
 class AdminService:
     def __init__(
         self,
         user_repository: UserRepository = Depends(),
         transaction_repository: TransactionRepository = Depends(),
-        loan_repository: LoanRepository = Depends()
+        loan_repository: LoanRepository = Depends(),
+        rollup_repository: RollupRepository = Depends()
     ):
         self.user_repository = user_repository
         self.transaction_repository = transaction_repository
         self.loan_repository = loan_repository
+        self.rollup_repository = rollup_repository
+
+    async def _read_from_rollups(self) -> bool:
+        # Until the first rebuild the rollups only hold what happened since
+        # they were deployed; keep using the raw collections until then
+        return settings.ANALYTICS_READ_FROM_ROLLUPS and await self.rollup_repository.is_rebuilt()
 
+    @traced()
     async def get_admin_dashboard_stats(self):
-        total_users = await self.user_repository.get_total_users()
-        active_users = await self.user_repository.get_active_users_count()
-        
-        total_transactions = await self.transaction_repository.get_total_transactions()
-        transaction_volume = await self.transaction_repository.get_total_volume()
-        
-        total_loans = await self.loan_repository.get_total_loans()
-        pending_loans = await self.loan_repository.get_loans_by_status("pending")
-        approved_loans = await self.loan_repository.get_loans_by_status("approved")
-        total_loan_amount = await self.loan_repository.get_total_loan_amount()
+        if await self._read_from_rollups():
+            user_counts, all_time = await asyncio.gather(
+                self.user_repository.get_user_counts(),
+                self.rollup_repository.get_all_time()
+            )
+            transactions = all_time.get("transactions", {})
+            transaction_totals = {"count": transactions.get("count", 0), "volume": transactions.get("volume", 0)}
+            loan_summary = all_time.get("loans", {}).get("byStatus", {})
+        else:
+            # Three independent aggregations, run concurrently
+            user_counts, transaction_totals, loan_summary = await asyncio.gather(
+                self.user_repository.get_user_counts(),
+                self.transaction_repository.get_totals(),
+                self.loan_repository.get_status_summary()
+            )
 
         return {
-            "total_users": total_users,
-            "active_users": active_users,
-            "total_transactions": total_transactions,
-            "transaction_volume": transaction_volume,
-            "total_loans": total_loans,
-            "pending_loans": len(pending_loans) if pending_loans else 0,
-            "approved_loans": len(approved_loans) if approved_loans else 0,
-            "total_loan_amount": total_loan_amount,
+            "total_users": user_counts["total"],
+            "active_users": user_counts["active"],
+            "total_transactions": transaction_totals["count"],
+            "transaction_volume": transaction_totals["volume"],
+            "total_loans": sum(group["count"] for group in loan_summary.values()),
+            "pending_loans": loan_summary.get("pending", {}).get("count", 0),
+            "approved_loans": loan_summary.get("approved", {}).get("count", 0),
+            "total_loan_amount": sum(group["amount"] for group in loan_summary.values()),
         }
 
-    async def get_transaction_chart_data(self, days: int = 14):
+    @traced()
+    async def get_transaction_chart_data(
+        self,
+        days: int = 14,
+        timezone: Optional[str] = None,
+        by_type: bool = False
+    ):
         """
-        Get transaction data grouped by day for the chart
+        Get transaction count and volume per day for the chart, with days
+        taken in the given IANA timezone (UTC by default)
         """
-        # Calculate the start date (days ago from now)
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        # Get transactions within the date range
-        transactions = await self.transaction_repository.get_transactions_in_date_range(start_date, end_date)
-        
-        # Initialize result array with one entry per day
-        result = []
+        tz = ZoneInfo(timezone) if timezone else dt_timezone.utc
+        today = datetime.now(tz).date()
+        first_day = today - timedelta(days=days - 1)
+
+        # Timestamps are stored as naive UTC
+        def utc_midnight(day):
+            local = datetime.combine(day, time.min, tzinfo=tz)
+            return local.astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+        start_date = utc_midnight(first_day)
+        end_date = utc_midnight(today + timedelta(days=1))
+        if tz.utcoffset(None) == timedelta(0) and await self._read_from_rollups():
+            # Rollups are bucketed by UTC day
+            rows = self._daily_rollup_rows(
+                await self.rollup_repository.get_range("day", start_date, end_date),
+                by_type
+            )
+        else:
+            rows = await self.transaction_repository.get_daily_totals(
+                start_date,
+                end_date,
+                timezone or "UTC",
+                by_type
+            )
+
+        # Initialize result array with one entry per day, so empty days are kept
+        result = {}
         for i in range(days):
-            day = end_date - timedelta(days=days-i-1)
-            result.append({
-                "date": day.strftime("%Y-%m-%d"),
-                "count": 0,
-                "volume": 0
-            })
-            
-        # Aggregate transactions by date
-        for transaction in transactions:
-            transaction_date = transaction.timestamp.strftime("%Y-%m-%d")
-            
-            # Find the matching day in our result array
-            for day_data in result:
-                if day_data["date"] == transaction_date:
-                    day_data["count"] += 1
-                    day_data["volume"] += transaction.amount
-                    break
-        
-        return result
+            date = (first_day + timedelta(days=i)).strftime("%Y-%m-%d")
+            result[date] = {"date": date, "count": 0, "volume": 0}
+            if by_type:
+                result[date]["types"] = {
+                    type_name: {"count": 0, "volume": 0} for type_name in TRANSACTION_TYPES
+                }
+
+        for row in rows:
+            day_data = result.get(row["date"])
+            if day_data is None:
+                continue
+            day_data["count"] += row["count"]
+            day_data["volume"] += row["volume"]
+            if by_type and row.get("type") in day_data["types"]:
+                day_data["types"][row["type"]] = {"count": row["count"], "volume": row["volume"]}
+
+        return list(result.values())
+
+    @staticmethod
+    def _daily_rollup_rows(docs, by_type: bool):
+        """Day rollup documents in the row format of get_daily_totals"""
+        rows = []
+        for doc in docs:
+            transactions = doc.get("transactions", {})
+            if by_type:
+                for type_name, totals in transactions.get("byType", {}).items():
+                    rows.append({"date": doc["date"], "type": type_name, **totals})
+            elif transactions:
+                rows.append({"date": doc["date"], "count": transactions["count"], "volume": transactions["volume"]})
+        return rows
     
+    @traced()
     async def get_transaction_distribution(self):
         """
         Get distribution of transactions by type
         """
-        transactions = await self.transaction_repository.get_all(limit=1000)  # Using get_all instead of get_all_transactions
-        
-        # Initialize counters for each type
+        if await self._read_from_rollups():
+            all_time = await self.rollup_repository.get_all_time()
+            summary = all_time.get("transactions", {}).get("byType", {})
+        else:
+            summary = await self.transaction_repository.get_type_summary()
+
+        # Counters for each type
         types = {
-            "deposit": 0,
-            "withdrawal": 0,
-            "transfer": 0
+            type_name: summary.get(type_name, {}).get("count", 0)
+            for type_name in ("deposit", "withdrawal", "transfer")
         }
-        
-        # Count transactions by type
-        for transaction in transactions:
-            if transaction.type in types:
-                types[transaction.type] += 1
                 
         # Format for frontend
         result = []
@@ -100,120 +159,125 @@ class AdminService:
             
         return result
     
-    async def get_user_growth_data(self, months: int = 12):
+    @traced()
+    async def get_user_growth_data(self, months: int = 12, cumulative: bool = False):
         """
-        Get user growth data for the given number of months
+        Get user registrations per month for the given number of months,
+        optionally with the running total of users at the end of each month
         """
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30 * months)
-        
-        # Get users created within this date range, ordered by creation date
-        users = await self.user_repository.get_users_registered_in_range(start_date, end_date)
-        
-        # Group users by month
+        end_date = datetime.utcnow()
+        month_starts = self._month_starts(end_date - timedelta(days=30 * months), end_date)
+
+        if await self._read_from_rollups():
+            docs, all_time = await asyncio.gather(
+                self.rollup_repository.get_range("month", month_starts[0], end_date),
+                self.rollup_repository.get_all_time()
+            )
+            registered = {doc["date"]: doc.get("users", {}).get("registered", 0) for doc in docs}
+            # The window runs up to now, so everything else registered before it
+            registered_before = all_time.get("users", {}).get("registered", 0) - sum(registered.values())
+        else:
+            queries = [self.user_repository.get_monthly_registrations(month_starts[0], end_date)]
+            if cumulative:
+                queries.append(self.user_repository.count_registered_before(month_starts[0]))
+            results = await asyncio.gather(*queries)
+            registered = results[0]
+            registered_before = results[1] if cumulative else 0
+
         result = []
-        current_date = start_date
-        while current_date <= end_date:
-            month_start = datetime(current_date.year, current_date.month, 1)
-            
-            # Check if we're in the current month
-            if month_start.month == end_date.month and month_start.year == end_date.year:
-                month_end = end_date
-            else:
-                # Get the last day of the month
-                if month_start.month == 12:
-                    month_end = datetime(month_start.year + 1, 1, 1) - timedelta(days=1)
-                else:
-                    month_end = datetime(month_start.year, month_start.month + 1, 1) - timedelta(days=1)
-            
-            # Count users registered in this month
-            count = 0
-            for user in users:
-                if month_start <= user.createdAt <= month_end:
-                    count += 1
-                    
-            result.append({
-                "date": month_start.strftime("%Y-%m"),
-                "count": count
-            })
-            
-            # Move to next month
-            if current_date.month == 12:
-                current_date = datetime(current_date.year + 1, 1, 1)
-            else:
-                current_date = datetime(current_date.year, current_date.month + 1, 1)
+        total = registered_before
+        for month in month_starts:
+            date = month.strftime("%Y-%m")
+            count = registered.get(date, 0)
+            entry = {"date": date, "count": count}
+            if cumulative:
+                total += count
+                entry["total"] = total
+            result.append(entry)
                 
         return result
     
-    async def get_loan_status_distribution(self):
+    @staticmethod
+    def _month_starts(start_date: datetime, end_date: datetime):
+        """First day of every month from start_date's month through end_date's"""
+        months = []
+        current = datetime(start_date.year, start_date.month, 1)
+        while current <= end_date:
+            months.append(current)
+            if current.month == 12:
+                current = datetime(current.year + 1, 1, 1)
+            else:
+                current = datetime(current.year, current.month + 1, 1)
+        return months
+    
+    @traced()
+    async def get_loan_status_distribution(self, include_amounts: bool = False):
         """
-        Get distribution of loans by status
+        Get distribution of loans over every status of the Loan model
         """
-        # Get counts for different loan statuses
-        pending_loans = await self.loan_repository.get_loans_by_status("pending")
-        approved_loans = await self.loan_repository.get_loans_by_status("approved")
-        rejected_loans = await self.loan_repository.get_loans_by_status("rejected")
-        completed_loans = await self.loan_repository.get_loans_by_status("completed")
+        if await self._read_from_rollups():
+            all_time = await self.rollup_repository.get_all_time()
+            summary = all_time.get("loans", {}).get("byStatus", {})
+        else:
+            summary = await self.loan_repository.get_status_summary()
         
         # Format for frontend
-        result = [
-            {"status": "pending", "count": len(pending_loans) if pending_loans else 0},
-            {"status": "approved", "count": len(approved_loans) if approved_loans else 0},
-            {"status": "rejected", "count": len(rejected_loans) if rejected_loans else 0},
-            {"status": "completed", "count": len(completed_loans) if completed_loans else 0}
-        ]
+        result = []
+        for status in LOAN_STATUSES:
+            entry = {"status": status, "count": summary.get(status, {}).get("count", 0)}
+            if include_amounts:
+                entry["amount"] = summary.get(status, {}).get("amount", 0)
+            result.append(entry)
         
         return result
     
+    @traced()
     async def get_recent_system_activity(self, limit: int = 10):
         """
         Get recent system activity (transactions, loans, etc.)
         """
-        # Get recent transactions
-        recent_transactions = await self.transaction_repository.get_recent_transactions(limit)
-        
-        # Get recent loan applications
-        recent_loans = await self.loan_repository.get_recent_loans(limit)
-        
-        # Combine and sort by timestamp
+        # Transactions and loan applications, merged and cut to limit by the database
+        items = await self.transaction_repository.get_recent_activity(limit)
+
+        # Resolve every owner name in one lookup
+        account_numbers = [
+            item.get("fromAccount") or item.get("toAccount")
+            for item in items if item["kind"] == "transaction"
+        ]
+        user_ids = [item["userId"] for item in items if item["kind"] == "loan"]
+        owners = await self.user_repository.get_summaries(user_ids, [a for a in account_numbers if a])
+        names_by_id = {owner["id"]: self._full_name(owner) for owner in owners}
+        names_by_account = {owner["accountNumber"]: self._full_name(owner) for owner in owners}
+
         activities = []
-        
-        for transaction in recent_transactions:
-            # For transactions, use fromAccount as the account identifier
-            account_id = transaction.fromAccount if transaction.fromAccount else transaction.toAccount
-            
-            activities.append({
-                "id": str(transaction.id),
-                "type": "transaction",
-                "description": f"{transaction.type.capitalize()} of {transaction.amount}",
-                "amount": transaction.amount,
-                "status": transaction.status,
-                "timestamp": transaction.timestamp,
-                "accountId": account_id,
-                "username": "Account " + str(account_id) if account_id else "System"
-            })
-            
-        for loan in recent_loans:
-            activities.append({
-                "id": str(loan.id),
-                "type": "loan",
-                "description": f"Loan application for {loan.amount}",
-                "amount": loan.amount,
-                "status": loan.status,
-                "timestamp": loan.requestDate,
-                "userId": loan.userId,
-                "username": await self._get_user_name(loan.userId)
-            })
-            
-        # Sort by timestamp (newest first) and limit
-        activities.sort(key=lambda x: x["timestamp"], reverse=True)
-        return activities[:limit]
+        for item in items:
+            if item["kind"] == "transaction":
+                # For transactions, use fromAccount as the account identifier
+                account_id = item.get("fromAccount") or item.get("toAccount")
+                activities.append({
+                    "id": str(item["id"]),
+                    "type": "transaction",
+                    "description": f"{item['type'].capitalize()} of {item['amount']}",
+                    "amount": item["amount"],
+                    "status": item["status"],
+                    "timestamp": item["timestamp"],
+                    "accountId": account_id,
+                    "username": names_by_account.get(account_id, "Unknown User") if account_id else "System"
+                })
+            else:
+                activities.append({
+                    "id": str(item["id"]),
+                    "type": "loan",
+                    "description": f"Loan application for {item['amount']}",
+                    "amount": item["amount"],
+                    "status": item["status"],
+                    "timestamp": item["timestamp"],
+                    "userId": item["userId"],
+                    "username": names_by_id.get(item["userId"], "Unknown User")
+                })
+
+        return activities
     
-    async def _get_user_name(self, user_id):
-        """
-        Helper method to get user's full name by ID
-        """
-        user = await self.user_repository.get_by_id(user_id)
-        if user:
-            return f"{user.firstName} {user.lastName}"
-        return "Unknown User"
+    @staticmethod
+    def _full_name(user: dict) -> str:
+        return f"{user['firstName']} {user['lastName']}"
@@ -5,10 +5,17 @@ from typing import Optional
 from datetime import timedelta
 
 from app.core.config import settings
-from app.core.security import verify_password, create_access_token
+from app.core.security import (
+    verify_password_async,
+    get_password_hash_async,
+    password_needs_rehash,
+    create_access_token,
+)
+from app.core.cache import user_cache
 from app.models.auth import TokenData
 from app.models.user import UserInDB, UserCreate
-from app.repositories.user_repository import UserRepository
+from app.repositories.user_repository import EmailAlreadyRegistered, UserRepository
+from app.core.tracing import span, traced
 import logging
 from fastapi import Depends
 
@@ -24,17 +31,25 @@ def get_user_repository(user_repository: UserRepository = Depends()):
 class AuthService:
     def __init__(self, user_repository: UserRepository = Depends()):
         self.user_repository = user_repository
-        logger.info("AuthService initialized")
 
+    @traced()
     async def authenticate_user(self, email: str, password: str) -> Optional[UserInDB]:
         logger.info(f"Authentication attempt for email: {email}")
         user = await self.user_repository.get_by_email(email)
         if not user:
             logger.warning(f"User not found for email: {email}")
             return None
-        if not verify_password(password, user.password):
+        with span("bcrypt.verify"):
+            password_ok = await verify_password_async(password, user.password)
+        if not password_ok:
             logger.warning(f"Invalid password for email: {email}")
             return None
+        if password_needs_rehash(user.password):
+            # Migrate the stored hash to the configured bcrypt cost while the
+            # plain password is at hand
+            user.password = await get_password_hash_async(password)
+            await self.user_repository.update_password(user.id, user.password)
+            logger.info(f"Rehashed password for email: {email}")
         logger.info(f"User authenticated successfully: {email}")
         return user
 
@@ -47,23 +62,29 @@ class AuthService:
         expires_delta = timedelta(seconds=settings.JWT_EXPIRATION_SECONDS)
         return create_access_token(token_data, expires_delta)
 
+    @traced()
     async def register_user(self, user_data: UserCreate) -> UserInDB:
         logger.info(f"Registration attempt for email: {user_data.email}")
-        # Check if user already exists
-        existing_user = await self.user_repository.get_by_email(user_data.email)
-        if existing_user:
+        # Create new user; the unique email index rejects a taken email
+        user_dict = user_data.model_dump()
+        try:
+            user = await self.user_repository.create(user_dict)
+        except EmailAlreadyRegistered:
             logger.warning(f"Registration failed: Email already registered: {user_data.email}")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        
-        # Create new user
-        user_dict = user_data.model_dump()
-        user = await self.user_repository.create(user_dict)
+        if user is None:
+            # Database error, already logged by the repository
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Registration is temporarily unavailable, please try again"
+            )
         logger.info(f"User registered successfully: {user.email}")
         return user
 
+    @traced()
     async def get_current_user(self, token: str = Depends(oauth2_scheme)) -> UserInDB:
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,11 +93,12 @@ class AuthService:
         )
         
         try:
-            payload = jwt.decode(
-                token, 
-                settings.JWT_SECRET, 
-                algorithms=[settings.JWT_ALGORITHM]
-            )
+            with span("jwt.decode"):
+                payload = jwt.decode(
+                    token, 
+                    settings.JWT_SECRET, 
+                    algorithms=[settings.JWT_ALGORITHM]
+                )
             user_id: str = payload.get("sub")
             if user_id is None:
                 raise credentials_exception
@@ -84,8 +106,12 @@ class AuthService:
         except JWTError:
             raise credentials_exception
             
-        user = await self.user_repository.get_by_id(token_data.id)
+        with span("user_cache.get"):
+            user = user_cache.get(token_data.id)
         if user is None:
-            raise credentials_exception
+            user = await self.user_repository.get_by_id(token_data.id)
+            if user is None:
+                raise credentials_exception
+            user_cache.set(user.id, user)
             
         return user
@@ -1,8 +1,13 @@
 from typing import List, Optional, Tuple
 from datetime import datetime
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from app.core.database import run_in_transaction
 from app.models.loan import Loan, LoanCreate
 from app.repositories.loan_repository import LoanRepository
 from app.repositories.user_repository import UserRepository
+from app.services.transaction_service import TransactionRejected
+from app.core.tracing import traced
 
 class LoanService:
     def __init__(
@@ -13,6 +18,7 @@ class LoanService:
         self.loan_repository = loan_repository
         self.user_repository = user_repository
 
+    @traced()
     async def apply_for_loan(self, user_id: str, loan_data: LoanCreate) -> Loan:
         # Calculate interest rate based on term
         interest_rate = 5 + loan_data.term / 12  # Base rate + term adjustment
@@ -27,9 +33,11 @@ class LoanService:
         
         return await self.loan_repository.create(loan)
 
+    @traced()
     async def get_user_loans(self, user_id: str) -> List[Loan]:
         return await self.loan_repository.get_by_user(user_id)
 
+    @traced()
     async def approve_loan(self, loan_id: str) -> Tuple[bool, str, Optional[Loan]]:
         # Get loan
         loan = await self.loan_repository.get_by_id(loan_id)
@@ -39,16 +47,40 @@ class LoanService:
         if loan.status != "pending":
             return False, f"Loan is already {loan.status}", loan
         
-        # Update loan status
-        updated_loan = await self.loan_repository.update_status(loan_id, "approved")
-        
-        # Add loan amount to user's balance
-        user = await self.user_repository.get_by_id(loan.userId)
-        if user:
-            await self.user_repository.update_balance(user.id, user.balance + loan.amount)
+        # The status change and the credit commit together, and only the
+        # request whose pending -> approved update applied credits the user
+        try:
+            updated_loan = await run_in_transaction(
+                self.user_repository.db,
+                lambda session: self._approve(loan, session)
+            )
+        except TransactionRejected as e:
+            return False, e.message, await self.loan_repository.get_by_id(loan_id)
+
+        await self.loan_repository.record_status_change(loan, "pending", "approved")
         
         return True, "Loan approved successfully", updated_loan
 
+    async def _approve(self, loan: Loan, session: Optional[AsyncIOMotorClientSession]) -> Loan:
+        updated_loan = await self.loan_repository.update_status(
+            loan.id, "approved", "pending", session, record_rollup=False
+        )
+        if not updated_loan:
+            current = await self.loan_repository.get_by_id(loan.id)
+            raise TransactionRejected(f"Loan is already {current.status if current else 'removed'}")
+
+        try:
+            # Add loan amount to user's balance
+            if not await self.user_repository.credit(loan.userId, loan.amount, session):
+                raise TransactionRejected("Borrower account not found")
+        except Exception:
+            if session is None:
+                # No transaction to abort: put the loan back to pending
+                await self.loan_repository.update_status(loan.id, "pending", "approved", record_rollup=False)
+            raise
+        return updated_loan
+
+    @traced()
     async def reject_loan(self, loan_id: str) -> Tuple[bool, str, Optional[Loan]]:
         # Get loan
         loan = await self.loan_repository.get_by_id(loan_id)
@@ -58,29 +90,37 @@ class LoanService:
         if loan.status != "pending":
             return False, f"Loan is already {loan.status}", loan
         
-        # Update loan status
-        updated_loan = await self.loan_repository.update_status(loan_id, "rejected")
+        # Update loan status, unless a concurrent request decided it first
+        updated_loan = await self.loan_repository.update_status(loan_id, "rejected", "pending")
+        if not updated_loan:
+            current = await self.loan_repository.get_by_id(loan_id)
+            return False, f"Loan is already {current.status if current else 'removed'}", current
         
         return True, "Loan rejected successfully", updated_loan
 
+    @traced()
     async def get_all_loans(
         self, 
         limit: int = 10, 
         offset: int = 0, 
-        status: Optional[str] = None
+        status: Optional[str] = None,
+        cursor: Optional[str] = None
     ) -> Tuple[List[dict], int]:
-        loans = await self.loan_repository.get_all(limit, offset, status)
-        total = await self.loan_repository.count(status)
+        loans, total = await asyncio.gather(
+            self.loan_repository.get_all(limit, offset, status, cursor),
+            self.loan_repository.count(status)
+        )
         
-        # Enhance loan data with user account information
+        # Enhance loan data with user account information, fetched for the
+        # whole page in one query
+        users = await self.user_repository.get_summaries_by_ids([loan.userId for loan in loans])
         enhanced_loans = []
         for loan in loans:
             loan_dict = loan.dict()
-            # Get user information for this loan
-            user = await self.user_repository.get_by_id(loan.userId)
+            user = users.get(loan.userId)
             if user:
-                loan_dict["accountNumber"] = user.accountNumber
-                loan_dict["userName"] = f"{user.firstName} {user.lastName}"
+                loan_dict["accountNumber"] = user["accountNumber"]
+                loan_dict["userName"] = f"{user['firstName']} {user['lastName']}"
             else:
                 loan_dict["accountNumber"] = "Unknown"
                 loan_dict["userName"] = "Unknown User"
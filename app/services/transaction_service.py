@@ -1,7 +1,32 @@
-from typing import List, Optional, Tuple
-from app.models.transaction import Transaction, TransactionCreate
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from app.core.config import settings
+from app.core.database import run_in_transaction
+from app.core.export import ENCODERS
+from app.core.metrics import TRANSACTIONS
+from app.models.transaction import (
+    BatchTransferCreate, BatchTransferItem, BatchTransferResult, Transaction, TransactionCreate
+)
+from app.models.user import UserInDB
 from app.repositories.transaction_repository import TransactionRepository
 from app.repositories.user_repository import UserRepository
+from app.core.tracing import traced
+
+# Column order of transaction exports
+EXPORT_FIELDS = ["id", "timestamp", "type", "status", "fromAccount", "toAccount", "amount", "description"]
+
+class TransactionRejected(Exception):
+    """Business rule failure; aborts the surrounding session transaction."""
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+class BatchRejected(TransactionRejected):
+    """A whole batch rejected, with the result of every item."""
+    def __init__(self, message: str, results: List[BatchTransferResult]):
+        super().__init__(message)
+        self.results = results
 
 class TransactionService:
     def __init__(
@@ -12,92 +37,304 @@ class TransactionService:
         self.transaction_repository = transaction_repository
         self.user_repository = user_repository
 
+    @traced()
     async def create_transaction(
         self, 
         user_id: str, 
         transaction_data: TransactionCreate
     ) -> Tuple[bool, str, Optional[Transaction]]:
-        # Get sender
-        sender = await self.user_repository.get_by_id(user_id)
-        if not sender:
-            return False, "Sender not found", None
-        
-        # Check if it's a transfer
+        if transaction_data.amount <= 0:
+            TRANSACTIONS.labels(transaction_data.type, "rejected").inc()
+            return False, "Amount must be greater than zero", None
+
         if transaction_data.type == "transfer":
-            # Get recipient
-            recipient = await self.user_repository.get_by_account_number(transaction_data.toAccount)
+            operation = self._transfer
+        elif transaction_data.type == "deposit":
+            operation = self._deposit
+        else:
+            operation = self._withdraw
+
+        # Balance checks happen inside the conditional $inc updates, so
+        # concurrent transactions cannot overdraw an account or lose updates
+        try:
+            saved_transaction = await run_in_transaction(
+                self.user_repository.db,
+                lambda session: operation(user_id, transaction_data, session)
+            )
+        except TransactionRejected as e:
+            TRANSACTIONS.labels(transaction_data.type, "rejected").inc()
+            return False, e.message, None
+        except Exception:
+            TRANSACTIONS.labels(transaction_data.type, "failed").inc()
+            raise
+
+        TRANSACTIONS.labels(transaction_data.type, "completed").inc()
+        await self.transaction_repository.record_rollup(saved_transaction)
+        
+        return True, "Transaction completed successfully", saved_transaction
+
+    async def _debit_sender(
+        self,
+        user_id: str,
+        amount: float,
+        session: Optional[AsyncIOMotorClientSession]
+    ) -> UserInDB:
+        sender = await self.user_repository.debit(user_id, amount, session)
+        if sender:
+            return sender
+        # Only the failure path pays for telling the two cases apart
+        if not await self.user_repository.get_by_id(user_id):
+            raise TransactionRejected("Sender not found")
+        raise TransactionRejected("Insufficient funds")
+
+    @traced()
+    async def _transfer(
+        self,
+        user_id: str,
+        transaction_data: TransactionCreate,
+        session: Optional[AsyncIOMotorClientSession]
+    ) -> Transaction:
+        amount = transaction_data.amount
+        sender = await self._debit_sender(user_id, amount, session)
+        recipient = None
+        try:
+            if sender.accountNumber == transaction_data.toAccount:
+                raise TransactionRejected("Cannot transfer to the same account")
+
+            recipient = await self.user_repository.credit_account(transaction_data.toAccount, amount, session)
             if not recipient:
-                return False, "Recipient account not found", None
-
-            if sender.accountNumber == recipient.accountNumber:
-                return False, "Cannot transfer to the same account", None
-            
-            # Check if sender has enough balance
-            if sender.balance < transaction_data.amount:
-                return False, "Insufficient funds", None
-            
-            # Create transaction
+                raise TransactionRejected("Recipient account not found")
+
             transaction = Transaction(
                 fromAccount=sender.accountNumber,
                 toAccount=recipient.accountNumber,
-                amount=transaction_data.amount,
+                amount=amount,
                 description=transaction_data.description or "Transfer",
                 type="transfer"
             )
-            
-            # Update balances
-            await self.user_repository.update_balance(sender.id, sender.balance - transaction_data.amount)
-            await self.user_repository.update_balance(recipient.id, recipient.balance + transaction_data.amount)
-        
-        # Handle deposit
-        elif transaction_data.type == "deposit":
+            return await self.transaction_repository.create(transaction, session, record_rollup=False)
+        except Exception:
+            if session is None:
+                # No transaction to abort: undo the legs that were applied
+                await self.user_repository.credit(sender.id, amount)
+                if recipient:
+                    await self.user_repository.credit(recipient.id, -amount)
+            raise
+
+    @traced()
+    async def create_batch_transfer(
+        self,
+        user_id: str,
+        batch: BatchTransferCreate
+    ) -> Tuple[bool, str, List[BatchTransferResult]]:
+        """
+        Pay many recipients at once. Invalid items are rejected individually;
+        the rest move together: the sender is debited their total once, so a
+        batch the balance does not cover is rejected as a whole.
+        """
+        items = batch.transfers
+        try:
+            results = await run_in_transaction(
+                self.user_repository.db,
+                lambda session: self._batch_transfer(user_id, items, session)
+            )
+        except BatchRejected as e:
+            TRANSACTIONS.labels("transfer", "rejected").inc(len(items))
+            return False, e.message, e.results
+        except Exception:
+            TRANSACTIONS.labels("transfer", "failed").inc(len(items))
+            raise
+
+        transactions = [result.transaction for result in results if result.success]
+        TRANSACTIONS.labels("transfer", "completed").inc(len(transactions))
+        TRANSACTIONS.labels("transfer", "rejected").inc(len(items) - len(transactions))
+        await self.transaction_repository.record_rollups(transactions)
+
+        return bool(transactions), f"{len(transactions)} of {len(items)} transfers completed", results
+
+    @staticmethod
+    def _batch_result(
+        index: int,
+        item: BatchTransferItem,
+        message: str,
+        transaction: Optional[Transaction] = None
+    ) -> BatchTransferResult:
+        return BatchTransferResult(
+            index=index,
+            toAccount=item.toAccount,
+            amount=item.amount,
+            success=transaction is not None,
+            message=message,
+            transaction=transaction
+        )
+
+    @traced()
+    async def _batch_transfer(
+        self,
+        user_id: str,
+        items: List[BatchTransferItem],
+        session: Optional[AsyncIOMotorClientSession]
+    ) -> List[BatchTransferResult]:
+        recipients = await self.user_repository.get_ids_by_account_numbers(
+            [item.toAccount for item in items], session
+        )
+        results: List[Optional[BatchTransferResult]] = [None] * len(items)
+        accepted = []
+        for index, item in enumerate(items):
+            if item.amount <= 0:
+                results[index] = self._batch_result(index, item, "Amount must be greater than zero")
+            elif item.toAccount not in recipients:
+                results[index] = self._batch_result(index, item, "Recipient account not found")
+            elif recipients[item.toAccount] == user_id:
+                results[index] = self._batch_result(index, item, "Cannot transfer to the same account")
+            else:
+                accepted.append(index)
+        if not accepted:
+            return results
+
+        try:
+            transactions = await self._move_batch(user_id, items, accepted, recipients, session)
+        except TransactionRejected as e:
+            # Items already rejected keep their own reason
+            raise BatchRejected(e.message, [
+                result or self._batch_result(index, items[index], e.message)
+                for index, result in enumerate(results)
+            ])
+
+        for index, transaction in zip(accepted, transactions):
+            results[index] = self._batch_result(index, items[index], "Transfer completed", transaction)
+        return results
+
+    async def _move_batch(
+        self,
+        user_id: str,
+        items: List[BatchTransferItem],
+        accepted: List[int],
+        recipients: Dict[str, str],
+        session: Optional[AsyncIOMotorClientSession]
+    ) -> List[Transaction]:
+        """Debit the sender once, credit the recipients and record the accepted items"""
+        # One $inc per recipient, however many payouts they receive
+        credits = {}
+        for index in accepted:
+            recipient_id = recipients[items[index].toAccount]
+            credits[recipient_id] = credits.get(recipient_id, 0) + items[index].amount
+        total = sum(credits.values())
+
+        sender = await self._debit_sender(user_id, total, session)
+        credited = False
+        try:
+            matched = await self.user_repository.credit_many(credits, session)
+            credited = True
+            if matched != len(credits):
+                raise TransactionRejected("Recipient account not found")
+
+            transactions = [
+                Transaction(
+                    fromAccount=sender.accountNumber,
+                    toAccount=items[index].toAccount,
+                    amount=items[index].amount,
+                    description=items[index].description or "Transfer",
+                    type="transfer"
+                )
+                for index in accepted
+            ]
+            await self.transaction_repository.create_many(transactions, session)
+        except Exception:
+            if session is None:
+                # No transaction to abort: undo the legs that were applied
+                await self.user_repository.credit(sender.id, total)
+                if credited:
+                    await self.user_repository.credit_many({user: -amount for user, amount in credits.items()})
+            raise
+        return transactions
+
+    @traced()
+    async def _deposit(
+        self,
+        user_id: str,
+        transaction_data: TransactionCreate,
+        session: Optional[AsyncIOMotorClientSession]
+    ) -> Transaction:
+        amount = transaction_data.amount
+        user = await self.user_repository.credit(user_id, amount, session)
+        if not user:
+            raise TransactionRejected("Sender not found")
+        try:
             transaction = Transaction(
-                toAccount=sender.accountNumber,
-                amount=transaction_data.amount,
+                toAccount=user.accountNumber,
+                amount=amount,
                 description=transaction_data.description or "Deposit",
                 type="deposit"
             )
-            
-            # Update balance
-            await self.user_repository.update_balance(sender.id, sender.balance + transaction_data.amount)
-        
-        # Handle withdrawal
-        elif transaction_data.type == "withdrawal":
-            # Check if user has enough balance
-            if sender.balance < transaction_data.amount:
-                return False, "Insufficient funds", None
-                
+            return await self.transaction_repository.create(transaction, session, record_rollup=False)
+        except Exception:
+            if session is None:
+                await self.user_repository.credit(user.id, -amount)
+            raise
+
+    @traced()
+    async def _withdraw(
+        self,
+        user_id: str,
+        transaction_data: TransactionCreate,
+        session: Optional[AsyncIOMotorClientSession]
+    ) -> Transaction:
+        amount = transaction_data.amount
+        user = await self._debit_sender(user_id, amount, session)
+        try:
             transaction = Transaction(
-                fromAccount=sender.accountNumber,
-                amount=transaction_data.amount,
+                fromAccount=user.accountNumber,
+                amount=amount,
                 description=transaction_data.description or "Withdrawal",
                 type="withdrawal"
             )
-            
-            # Update balance
-            await self.user_repository.update_balance(sender.id, sender.balance - transaction_data.amount)
-        
-        # Save transaction
-        saved_transaction = await self.transaction_repository.create(transaction)
-        
-        return True, "Transaction completed successfully", saved_transaction
+            return await self.transaction_repository.create(transaction, session, record_rollup=False)
+        except Exception:
+            if session is None:
+                await self.user_repository.credit(user.id, amount)
+            raise
 
+    @traced()
     async def get_user_transactions(
         self, 
         account_number: str, 
         limit: int = 10, 
-        offset: int = 0
-    ) -> Tuple[List[Transaction], int]:
-        transactions = await self.transaction_repository.get_by_account(account_number, limit, offset)
-        total = await self.transaction_repository.count_by_account(account_number)
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> Tuple[List[Transaction], Optional[int]]:
+        transactions = await self.transaction_repository.get_by_account(account_number, limit, offset, cursor)
+        # Counting reads every index key of the account; skip it when the caller pages by cursor
+        total = await self.transaction_repository.count_by_account(account_number) if include_total else None
         return transactions, total
 
+    @traced()
     async def get_all_transactions(
         self, 
         limit: int = 10, 
         offset: int = 0, 
-        type: Optional[str] = None
+        type: Optional[str] = None,
+        cursor: Optional[str] = None
     ) -> Tuple[List[Transaction], int]:
-        transactions = await self.transaction_repository.get_all(limit, offset, type)
+        transactions = await self.transaction_repository.get_all(limit, offset, type, cursor)
         total = await self.transaction_repository.count(type)
         return transactions, total
+
+    def export_transactions(
+        self,
+        format: str,
+        account_number: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        type: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """Encoded export chunks, produced lazily as the response is streamed"""
+        transactions = self.transaction_repository.stream(
+            account_number,
+            start_date,
+            end_date,
+            type,
+            batch_size=settings.EXPORT_BATCH_SIZE
+        )
+        return ENCODERS[format](transactions, EXPORT_FIELDS)
@@ -0,0 +1,141 @@
+"""
+Benchmark GET /api/admin/stats at 1M transactions / 100k loans.
+
+Seeds a scratch database (once; rerunning reuses the data) and times
+AdminService.get_admin_dashboard_stats, reading both from aggregations over
+raw history and from the rollup collection, against the previous
+implementation: eight sequential awaits with two 100-document loan loads.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_admin_stats \
+        [--transactions 1000000] [--loans 100000] [--iterations 20]
+"""
+from datetime import datetime, timedelta
+from uuid import uuid4
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.core.migrations import run_migrations
+from app.repositories.user_repository import UserRepository
+from app.repositories.transaction_repository import TransactionRepository
+from app.repositories.loan_repository import LoanRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.services.admin_service import AdminService
+
+BATCH_SIZE = 10000
+USERS = 10000
+
+
+async def _seed(collection, target: int, make_doc) -> None:
+    existing = await collection.estimated_document_count()
+    for start in range(existing, target, BATCH_SIZE):
+        batch = [make_doc(i) for i in range(start, min(start + BATCH_SIZE, target))]
+        await collection.insert_many(batch, ordered=False)
+
+
+async def seed(db, transactions: int, loans: int) -> None:
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    accounts = [f"{1000000000 + i}" for i in range(USERS)]
+
+    def user(i):
+        return {
+            "id": str(uuid4()), "email": f"bench{i}@example.com", "firstName": "Bench", "lastName": str(i),
+            "password": "x", "accountNumber": accounts[i], "balance": 1000.0,
+            "createdAt": now - timedelta(days=rng.randint(0, 365)), "role": "user",
+        }
+
+    def transaction(i):
+        return {
+            "id": str(uuid4()), "fromAccount": rng.choice(accounts), "toAccount": rng.choice(accounts),
+            "amount": round(rng.uniform(1, 500), 2), "description": "Transfer", "type": "transfer",
+            "timestamp": now - timedelta(seconds=rng.randint(0, 365 * 86400)), "status": "completed",
+        }
+
+    def loan(i):
+        return {
+            "id": str(uuid4()), "userId": str(i), "amount": round(rng.uniform(100, 10000), 2), "term": 12,
+            "interestRate": 6.0, "status": rng.choice(["pending", "approved", "rejected", "paid"]),
+            "requestDate": now - timedelta(seconds=rng.randint(0, 365 * 86400)),
+            "approvalDate": None, "dueDate": None,
+        }
+
+    await _seed(db.users, USERS, user)
+    await _seed(db.transactions, transactions, transaction)
+    await _seed(db.loans, loans, loan)
+
+
+async def legacy_dashboard_stats(service: AdminService) -> dict:
+    """The sequential implementation this benchmark compares against."""
+    total_users = await service.user_repository.get_total_users()
+    active_users = await service.user_repository.get_active_users_count()
+    total_transactions = await service.transaction_repository.get_total_transactions()
+    transaction_volume = await service.transaction_repository.get_total_volume()
+    total_loans = await service.loan_repository.get_total_loans()
+    pending_loans = await service.loan_repository.get_loans_by_status("pending")
+    approved_loans = await service.loan_repository.get_loans_by_status("approved")
+    total_loan_amount = await service.loan_repository.get_total_loan_amount()
+    return {
+        "total_users": total_users,
+        "active_users": active_users,
+        "total_transactions": total_transactions,
+        "transaction_volume": transaction_volume,
+        "total_loans": total_loans,
+        "pending_loans": len(pending_loans),
+        "approved_loans": len(approved_loans),
+        "total_loan_amount": total_loan_amount,
+    }
+
+
+async def time_calls(fn, iterations: int) -> dict:
+    await fn()  # warm up
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 2),
+        "mean_ms": round(statistics.fmean(timings), 2),
+    }
+
+
+async def main(args) -> None:
+    client = AsyncIOMotorClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    db = client[args.database]
+    await run_migrations(db)
+    await seed(db, args.transactions, args.loans)
+    await RollupRepository(db).rebuild()
+
+    service = AdminService(UserRepository(db), TransactionRepository(db), LoanRepository(db), RollupRepository(db))
+    print(f"transactions={await db.transactions.estimated_document_count()} "
+          f"loans={await db.loans.estimated_document_count()}")
+
+    legacy = await legacy_dashboard_stats(service)
+    print(f"legacy      pending/approved: {legacy['pending_loans']}/{legacy['approved_loans']}")
+    print("legacy     ", await time_calls(lambda: legacy_dashboard_stats(service), args.iterations))
+
+    for label, from_rollups in (("aggregation", False), ("rollups", True)):
+        settings.ANALYTICS_READ_FROM_ROLLUPS = from_rollups
+        current = await service.get_admin_dashboard_stats()
+        print(f"{label:<11} pending/approved: {current['pending_loans']}/{current['approved_loans']}")
+        print(f"{label:<11}", await time_calls(service.get_admin_dashboard_stats, args.iterations))
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database", default="floosy_bench")
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--loans", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,132 @@
+"""
+Per-request cost of resolving route dependencies: the previous chain that
+built fresh repositories and services on every request versus the
+application container.
+
+Each variant serves a probe endpoint that depends on the transaction, loan
+and admin services (the widest graphs the routes use) and returns at once,
+so the difference to a dependency-free endpoint is pure resolution
+overhead. Requests go through the ASGI app in-process; no database is
+contacted.
+
+Usage:
+    python -m benchmarks.bench_dependencies [--requests 5000]
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+from app.api import dependencies
+from app.core.container import Container
+from app.repositories.user_repository import UserRepository
+from app.repositories.transaction_repository import TransactionRepository
+from app.repositories.loan_repository import LoanRepository
+from app.repositories.rollup_repository import RollupRepository
+from app.services.transaction_service import TransactionService
+from app.services.loan_service import LoanService
+from app.services.admin_service import AdminService
+
+
+# The per-request chain this benchmark compares against
+async def legacy_db(request: Request) -> AsyncIOMotorDatabase:
+    return request.app.state.database
+
+async def legacy_user_repository(db: AsyncIOMotorDatabase = Depends(legacy_db)) -> UserRepository:
+    return UserRepository(db)
+
+async def legacy_transaction_repository(db: AsyncIOMotorDatabase = Depends(legacy_db)) -> TransactionRepository:
+    return TransactionRepository(db)
+
+async def legacy_loan_repository(db: AsyncIOMotorDatabase = Depends(legacy_db)) -> LoanRepository:
+    return LoanRepository(db)
+
+async def legacy_rollup_repository(db: AsyncIOMotorDatabase = Depends(legacy_db)) -> RollupRepository:
+    return RollupRepository(db)
+
+async def legacy_transaction_service(
+    transaction_repository: TransactionRepository = Depends(legacy_transaction_repository),
+    user_repository: UserRepository = Depends(legacy_user_repository)
+) -> TransactionService:
+    return TransactionService(transaction_repository, user_repository)
+
+async def legacy_loan_service(
+    loan_repository: LoanRepository = Depends(legacy_loan_repository),
+    user_repository: UserRepository = Depends(legacy_user_repository)
+) -> LoanService:
+    return LoanService(loan_repository, user_repository)
+
+async def legacy_admin_service(
+    user_repository: UserRepository = Depends(legacy_user_repository),
+    transaction_repository: TransactionRepository = Depends(legacy_transaction_repository),
+    loan_repository: LoanRepository = Depends(legacy_loan_repository),
+    rollup_repository: RollupRepository = Depends(legacy_rollup_repository)
+) -> AdminService:
+    return AdminService(user_repository, transaction_repository, loan_repository, rollup_repository)
+
+
+def build_app(db: AsyncIOMotorDatabase) -> FastAPI:
+    app = FastAPI()
+    app.state.database = db
+    app.state.container = Container(db)
+
+    @app.get("/baseline")
+    async def baseline():
+        return {}
+
+    @app.get("/legacy")
+    async def legacy(
+        transactions: TransactionService = Depends(legacy_transaction_service),
+        loans: LoanService = Depends(legacy_loan_service),
+        admin: AdminService = Depends(legacy_admin_service)
+    ):
+        return {}
+
+    @app.get("/container")
+    async def container(
+        transactions: TransactionService = Depends(dependencies.get_transaction_service),
+        loans: LoanService = Depends(dependencies.get_loan_service),
+        admin: AdminService = Depends(dependencies.get_admin_service)
+    ):
+        return {}
+
+    return app
+
+
+async def per_request_us(client: httpx.AsyncClient, path: str, requests: int) -> list:
+    for _ in range(100):  # warm up
+        await client.get(path)
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await client.get(path)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return timings
+
+
+async def main(args) -> None:
+    # The app configures INFO logging; httpx would log every request
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Motor connects lazily; nothing here issues a database command
+    client = AsyncIOMotorClient("mongodb://localhost:27017")
+    app = build_app(client["floosy_bench"])
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        baseline = statistics.median(await per_request_us(http, "/baseline", args.requests))
+        print(f"{args.requests} requests per variant, median latency per request")
+        print(f"{'baseline':<10} {baseline:8.1f} us")
+        for path in ("legacy", "container"):
+            median = statistics.median(await per_request_us(http, f"/{path}", args.requests))
+            print(f"{path:<10} {median:8.1f} us   resolution overhead {median - baseline:8.1f} us")
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dependency resolution benchmark")
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(main(parser.parse_args()))
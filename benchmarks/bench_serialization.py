@@ -0,0 +1,104 @@
+"""
+Per-response CPU cost of list endpoints: FastAPI's response_model path versus
+FastJSONResponse.
+
+The legacy path is what FastAPI ran for GET /api/admin/users and
+GET /api/admin/transactions before: User models rebuilt field by field,
+serialize_response validation against the response_model, jsonable_encoder
+and the stdlib JSON encoder. No database is needed.
+
+Usage:
+    python -m benchmarks.bench_serialization [--items 100] [--rounds 2000]
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.core.serialization import FastJSONResponse, public_users
+from app.models.transaction import Transaction, TransactionsResponse
+from app.models.user import User, UserInDB
+
+
+def make_users(count: int):
+    now = datetime.utcnow()
+    return [
+        UserInDB(
+            email=f"user{i}@example.com", firstName="First", lastName=f"Last{i}", password="$2b$12$" + "x" * 53,
+            accountNumber=f"{1000000000 + i}", balance=1234.5, createdAt=now - timedelta(days=i)
+        )
+        for i in range(count)
+    ]
+
+
+def make_transactions(count: int):
+    now = datetime.utcnow()
+    return [
+        Transaction(
+            fromAccount="1000000001", toAccount="1000000002", amount=10.0 + i, description="Transfer",
+            type="transfer", timestamp=now - timedelta(minutes=i)
+        )
+        for i in range(count)
+    ]
+
+
+async def legacy_users(users) -> bytes:
+    user_list = [
+        User(
+            id=user.id, email=user.email, firstName=user.firstName, lastName=user.lastName,
+            accountNumber=user.accountNumber, balance=user.balance, createdAt=user.createdAt, role=user.role
+        ) for user in users
+    ]
+    content = {"users": user_list, "total": len(users), "limit": len(users), "offset": 0}
+    field = create_response_field(name="Response", type_=dict, mode="serialization")
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def fast_users(users) -> bytes:
+    content = {"users": public_users(users), "total": len(users), "limit": len(users), "offset": 0}
+    return FastJSONResponse(content).body
+
+
+async def legacy_transactions(transactions) -> bytes:
+    content = TransactionsResponse(transactions=transactions, total=len(transactions), limit=len(transactions), offset=0)
+    field = create_response_field(name="Response", type_=TransactionsResponse, mode="serialization")
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def fast_transactions(transactions) -> bytes:
+    content = {"transactions": transactions, "total": len(transactions), "limit": len(transactions), "offset": 0}
+    return FastJSONResponse(content).body
+
+
+async def per_response_us(fn, items, rounds: int) -> float:
+    await fn(items)
+    started = time.process_time()
+    for _ in range(rounds):
+        await fn(items)
+    return (time.process_time() - started) / rounds * 1_000_000
+
+
+async def main(args) -> None:
+    users = make_users(args.items)
+    transactions = make_transactions(args.items)
+    cases = [
+        ("admin users", legacy_users, fast_users, users),
+        ("admin transactions", legacy_transactions, fast_transactions, transactions),
+    ]
+    print(f"{args.items} items per response, CPU time per response")
+    for name, legacy, fast, items in cases:
+        legacy_us = await per_response_us(legacy, items, args.rounds)
+        fast_us = await per_response_us(fast, items, args.rounds)
+        print(f"{name:<20} legacy {legacy_us:9.1f} us   fast {fast_us:9.1f} us   saved {legacy_us - fast_us:9.1f} us"
+              f" ({legacy_us / fast_us:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Response serialization benchmark")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
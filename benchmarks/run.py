@@ -0,0 +1,413 @@
+"""
+Load test of the whole API, in process.
+
+Drives main.app through httpx's ASGI transport (no sockets, no server), so
+the numbers cover routing, dependencies, services, serialization and the
+database round trips, and nothing else. Each scenario runs --requests
+requests from --concurrency concurrent clients; results are printed and
+saved as JSON for `compare`.
+
+Backends:
+    --mongo URI   a real mongod (a scratch database, dropped first)
+    --in-memory   mongomock-motor; no server needed, but it has no
+                  transactions, no $unionWith (admin_activity is skipped
+                  and flagged in the results) and very different
+                  performance. Use it to exercise the harness, not to
+                  judge the database paths.
+
+Usage:
+    python -m benchmarks.run --mongo mongodb://localhost:27017 [--concurrency 16] [--requests 500]
+        [--scenarios login,transfer,...] [--output results.json]
+    python -m benchmarks.run compare baseline.json candidate.json [--threshold 10]
+
+Needs the packages in benchmarks/requirements.txt. Registration and login
+are dominated by bcrypt; set BCRYPT_ROUNDS to compare other paths at a
+lower cost.
+"""
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.core.config import settings
+
+# One scenario per admin analytics endpoint
+ADMIN_ENDPOINTS = {
+    "admin_stats": "/api/admin/stats",
+    "admin_chart": "/api/admin/transactions/chart?days=30",
+    "admin_distribution": "/api/admin/transactions/distribution",
+    "admin_growth": "/api/admin/users/growth?months=12",
+    "admin_loan_distribution": "/api/admin/loans/distribution",
+    "admin_activity": "/api/admin/activity?limit=10",
+    "admin_users": "/api/admin/users?limit=20",
+    "admin_transactions": "/api/admin/transactions?limit=20",
+    "admin_loans": "/api/admin/loans?limit=20",
+}
+
+PASSWORD = "bench-password-1"
+# Payouts per batch_transfer request
+BATCH_SIZE = 100
+
+
+class Context:
+    """Accounts and tokens shared by the scenarios"""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.users: List[Dict[str, str]] = []
+        self.admin_headers: Dict[str, str] = {}
+        self.registered = 0
+
+    def user(self) -> Dict[str, str]:
+        return self.rng.choice(self.users)
+
+    def other_user(self, user: Dict[str, str]) -> Dict[str, str]:
+        while True:
+            other = self.rng.choice(self.users)
+            if other is not user:
+                return other
+
+
+async def _expect_ok(response: httpx.Response) -> httpx.Response:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code}")
+    body = response.json()
+    if isinstance(body, dict) and body.get("success") is False:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {body.get('message')}")
+    return response
+
+
+async def login(client: httpx.AsyncClient, ctx: Context) -> None:
+    user = ctx.user()
+    await _expect_ok(await client.post("/api/auth/login", data={"username": user["email"], "password": PASSWORD}))
+
+
+async def register(client: httpx.AsyncClient, ctx: Context) -> None:
+    ctx.registered += 1
+    payload = {
+        "email": f"bench-new-{ctx.registered}-{ctx.rng.getrandbits(32)}@example.com",
+        "firstName": "Bench",
+        "lastName": "New",
+        "password": PASSWORD,
+    }
+    await _expect_ok(await client.post("/api/auth/register", json=payload))
+
+
+async def transfer(client: httpx.AsyncClient, ctx: Context) -> None:
+    user = ctx.user()
+    payload = {"amount": 1, "toAccount": ctx.other_user(user)["accountNumber"], "type": "transfer"}
+    await _expect_ok(await client.post("/api/transactions", json=payload, headers=user["headers"]))
+
+
+async def batch_transfer(client: httpx.AsyncClient, ctx: Context) -> None:
+    user = ctx.user()
+    payload = {"transfers": [
+        {"amount": 1, "toAccount": ctx.other_user(user)["accountNumber"]} for _ in range(BATCH_SIZE)
+    ]}
+    await _expect_ok(await client.post("/api/transactions/batch", json=payload, headers=user["headers"]))
+
+
+async def deposit(client: httpx.AsyncClient, ctx: Context) -> None:
+    user = ctx.user()
+    payload = {"amount": 10, "toAccount": "", "type": "deposit"}
+    await _expect_ok(await client.post("/api/transactions", json=payload, headers=user["headers"]))
+
+
+async def history(client: httpx.AsyncClient, ctx: Context) -> None:
+    """First page of a user's history and the page after it"""
+    user = ctx.user()
+    first = await _expect_ok(await client.get("/api/transactions?limit=20", headers=user["headers"]))
+    cursor = first.json().get("nextCursor")
+    if cursor:
+        await _expect_ok(await client.get(f"/api/transactions?limit=20&cursor={cursor}", headers=user["headers"]))
+
+
+async def profile_update(client: httpx.AsyncClient, ctx: Context) -> None:
+    user = ctx.user()
+    payload = {"firstName": f"Bench{ctx.rng.randint(0, 999)}"}
+    await _expect_ok(await client.put("/api/users/profile", json=payload, headers=user["headers"]))
+
+
+def _admin_scenario(path: str) -> Callable[[httpx.AsyncClient, Context], Awaitable[None]]:
+    async def scenario(client: httpx.AsyncClient, ctx: Context) -> None:
+        await _expect_ok(await client.get(path, headers=ctx.admin_headers))
+    return scenario
+
+
+SCENARIOS: Dict[str, Callable[[httpx.AsyncClient, Context], Awaitable[None]]] = {
+    "login": login,
+    "register": register,
+    "transfer": transfer,
+    "batch_transfer": batch_transfer,
+    "deposit": deposit,
+    "history": history,
+    "profile_update": profile_update,
+    **{name: _admin_scenario(path) for name, path in ADMIN_ENDPOINTS.items()},
+}
+
+# Scenarios whose code path mongomock cannot run. Some repositories turn
+# database errors into empty results, so these would "succeed" with
+# meaningless timings; they are skipped and flagged instead.
+IN_MEMORY_UNSUPPORTED = {
+    "admin_activity": "mongomock has no $unionWith",
+}
+
+
+async def _database(args):
+    """The database to run against, and a cleanup callback"""
+    if args.in_memory:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--in-memory needs mongomock-motor (pip install -r benchmarks/requirements.txt)")
+        import app.core.database as database
+        # mongomock has neither transactions nor read preferences
+        database.transactions_supported = False
+        settings.ANALYTICS_READ_FROM_SECONDARIES = False
+        return AsyncMongoMockClient()[args.database], lambda: None
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.database import mongo_client_options
+    from app.core.migrations import run_migrations
+    from app.core.slow_queries import slow_query_log
+
+    # Same client options and listeners as the application
+    client = AsyncIOMotorClient(args.mongo, **mongo_client_options())
+    slow_query_log.bind(client)
+    await client.drop_database(args.database)
+    db = client[args.database]
+    await run_migrations(db)
+    return db, client.close
+
+
+async def _seed(client: httpx.AsyncClient, db, ctx: Context, users: int, transactions_per_user: int) -> None:
+    for i in range(users + 1):
+        email = f"bench-{i}@example.com"
+        payload = {"email": email, "firstName": "Bench", "lastName": str(i), "password": PASSWORD}
+        account = (await _expect_ok(await client.post("/api/auth/register", json=payload))).json()["user"]
+        if i == users:
+            await db.users.update_one({"id": account["id"]}, {"$set": {"role": "admin"}})
+        token = (await _expect_ok(await client.post(
+            "/api/auth/login", data={"username": email, "password": PASSWORD}
+        ))).json()["token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        if i == users:
+            ctx.admin_headers = headers
+        else:
+            ctx.users.append({"email": email, "accountNumber": account["accountNumber"], "headers": headers})
+
+    for user in ctx.users:
+        await _expect_ok(await client.post(
+            "/api/transactions", json={"amount": 1_000_000, "toAccount": "", "type": "deposit"}, headers=user["headers"]
+        ))
+        await _expect_ok(await client.post("/api/loans", json={"amount": 1000, "term": 12}, headers=user["headers"]))
+    for _ in range(len(ctx.users) * transactions_per_user):
+        await transfer(client, ctx)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    ctx: Context,
+    scenario: Callable,
+    requests: int,
+    concurrency: int
+) -> Dict[str, Any]:
+    timings: List[float] = []
+    errors: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                await scenario(client, ctx)
+            except Exception as e:
+                message = str(e)
+                errors[message] = errors.get(message, 0) + 1
+                continue
+            timings.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    result = {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "errorMessages": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(timings) / elapsed, 2) if elapsed else 0.0,
+    }
+    if timings:
+        result.update({
+            "meanMs": round(statistics.fmean(timings), 3),
+            "p50Ms": round(_percentile(timings, 0.50), 3),
+            "p95Ms": round(_percentile(timings, 0.95), 3),
+            "p99Ms": round(_percentile(timings, 0.99), 3),
+            "maxMs": round(timings[-1], 3),
+        })
+    return result
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_results(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'scenario':<24} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:<24} skipped: {result['skipped']}")
+            continue
+        print(f"{name:<24} {result['throughput']:>9.1f} {result.get('p50Ms', 0):>9.2f} "
+              f"{result.get('p95Ms', 0):>9.2f} {result.get('p99Ms', 0):>9.2f} {result['errors']:>7}")
+        for message, count in result["errorMessages"].items():
+            print(f"    {count} x {message}")
+
+
+async def run(args) -> None:
+    import main
+    from app.api.dependencies import get_container
+    from app.core.container import Container
+
+    # The app logs every login at INFO; keep the benchmark's own output readable
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    names = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}; available: {', '.join(SCENARIOS)}")
+
+    db, close = await _database(args)
+    container = Container(db)
+
+    async def bench_container() -> Container:
+        return container
+
+    # The lifespan would connect to MONGODB_URI; the benchmark brings its own database
+    main.app.dependency_overrides[get_container] = bench_container
+    transport = httpx.ASGITransport(app=main.app)
+    ctx = Context(args.seed)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            print(f"Seeding {args.users} users...")
+            await _seed(client, db, ctx, args.users, args.transactions_per_user)
+
+            results = {}
+            for name in names:
+                if args.in_memory and name in IN_MEMORY_UNSUPPORTED:
+                    results[name] = {"skipped": IN_MEMORY_UNSUPPORTED[name]}
+                    continue
+                await run_scenario(client, ctx, SCENARIOS[name], min(args.warmup, args.requests), args.concurrency)
+                results[name] = await run_scenario(client, ctx, SCENARIOS[name], args.requests, args.concurrency)
+    finally:
+        main.app.dependency_overrides.pop(get_container, None)
+        close()
+
+    _print_results(results)
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "backend": "in-memory" if args.in_memory else "mongo",
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "users": args.users,
+            "seed": args.seed,
+            "bcryptRounds": settings.BCRYPT_ROUNDS,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"{datetime.utcnow():%Y%m%dT%H%M%S}-{report['meta']['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {output}")
+
+
+def compare(args) -> int:
+    """Print per-scenario changes; exit non-zero if any p95 regressed by more than --threshold percent"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"baseline  {baseline['meta'].get('commit')} ({baseline['meta']['backend']}, "
+          f"concurrency {baseline['meta']['concurrency']})")
+    print(f"candidate {candidate['meta'].get('commit')} ({candidate['meta']['backend']}, "
+          f"concurrency {candidate['meta']['concurrency']})")
+    print(f"{'scenario':<24} {'req/s':>16} {'p50 ms':>16} {'p95 ms':>16} {'p99 ms':>16}")
+
+    def change(old: float, new: float) -> str:
+        if not old:
+            return f"{new:>8.1f}       "
+        return f"{new:>8.1f} {(new - old) / old * 100:>+6.1f}%"
+
+    regressions = []
+    for name, new in candidate["results"].items():
+        old = baseline["results"].get(name)
+        if "skipped" in new or (old and "skipped" in old):
+            print(f"{name:<24} skipped: {new.get('skipped') or old.get('skipped')}")
+            continue
+        if old is None or "p95Ms" not in old or "p95Ms" not in new:
+            continue
+        print(f"{name:<24} {change(old['throughput'], new['throughput'])} {change(old['p50Ms'], new['p50Ms'])} "
+              f"{change(old['p95Ms'], new['p95Ms'])} {change(old['p99Ms'], new['p99Ms'])}")
+        if old["p95Ms"] and (new["p95Ms"] - old["p95Ms"]) / old["p95Ms"] * 100 > args.threshold:
+            regressions.append(name)
+
+    if regressions:
+        print(f"p95 regressed by more than {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser(prog="python -m benchmarks.run compare", description=compare.__doc__)
+        parser.add_argument("baseline")
+        parser.add_argument("candidate")
+        parser.add_argument("--threshold", type=float, default=10.0)
+        sys.exit(compare(parser.parse_args(sys.argv[2:])))
+
+    parser = argparse.ArgumentParser(description="In-process API load test")
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--mongo", metavar="URI")
+    backend.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--database", default="floosy_loadtest")
+    parser.add_argument("--scenarios", help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--transactions-per-user", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="results file (default benchmarks/results/<time>-<commit>.json)")
+    asyncio.run(run(parser.parse_args()))
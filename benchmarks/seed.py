@@ -0,0 +1,270 @@
+"""
+Deterministic synthetic data at production scale.
+
+Generates users, transactions and loans shaped like UserInDB, Transaction
+and Loan documents, with realistic skew:
+
+- hot merchant accounts: --hot-share of transfers go to the first
+  --hot-accounts users
+- heavy-tailed amounts: Pareto(--amount-alpha) above a small base
+- seasonal timestamps: yearly, weekly and daily cycles (--seasonality
+  scales the yearly swing), and more recent sign-ups
+
+Documents are produced in batches by --producers worker processes, each
+generating a batch and writing it with an unordered insert_many on its own
+connection. Every batch is generated from its own seed-derived RNG, so the
+same --seed and --end-date produce the same documents whatever the number
+of producers. Every user shares one password (--password), hashed with
+bcrypt once up front.
+
+Load into a fresh database (--drop): indexes are built once at the end by
+the regular migrations, which is much faster than maintaining them during
+the load, and then the analytics rollups are rebuilt from the loaded history.
+Balances are random and not reconciled with the generated history.
+
+Usage:
+    python -m benchmarks.seed --mongo mongodb://localhost:27017 --database floosy_load --drop \
+        [--users 1000000] [--transactions 10000000] [--loans 500000] [--seed 42]
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+import uuid
+
+from pymongo import MongoClient
+
+# Namespace for the deterministic document ids
+ID_NAMESPACE = uuid.UUID("6f0c1f8e-2d0b-4a8e-9a53-3b0e6c7d1a42")
+
+TRANSACTION_TYPES = [("transfer", 0.7), ("deposit", 0.2), ("withdrawal", 0.1)]
+LOAN_STATUSES = [("pending", 0.2), ("approved", 0.5), ("rejected", 0.15), ("paid", 0.15)]
+LOAN_TERMS = [6, 12, 24, 36]
+FIRST_NAMES = ["Ahmed", "Mona", "Omar", "Sara", "Youssef", "Nour", "Karim", "Laila", "Hassan", "Dina"]
+LAST_NAMES = ["Kamal", "Hassan", "Ali", "Farouk", "Mansour", "Saleh", "Nabil", "Fathy", "Zaki", "Adel"]
+
+# Set in each producer process by _init_producer
+_config: Dict[str, Any] = {}
+_client: Optional[MongoClient] = None
+
+
+def document_id(seed: int, kind: str, index: int) -> str:
+    return str(uuid.uuid5(ID_NAMESPACE, f"{seed}:{kind}:{index}"))
+
+
+def account_number(index: int) -> str:
+    return str(1_000_000_000 + index)
+
+
+def _pick(rng: random.Random, weighted: List[Tuple[str, float]]) -> str:
+    roll = rng.random()
+    for value, weight in weighted:
+        roll -= weight
+        if roll < 0:
+            return value
+    return weighted[-1][0]
+
+
+def _activity_weight(moment: datetime, seasonality: float) -> float:
+    """Relative activity at a moment: yearly swing peaking in December, quiet weekends and nights"""
+    yearly = 1 + seasonality * math.cos(2 * math.pi * (moment.timetuple().tm_yday - 350) / 365)
+    weekly = 0.7 if moment.weekday() >= 5 else 1.0
+    daily = 0.25 + 0.75 * math.sin(math.pi * max(moment.hour - 6, 0) / 18) if 6 <= moment.hour else 0.25
+    return yearly * weekly * daily
+
+
+def _seasonal_moment(rng: random.Random, start: datetime, span_seconds: float, seasonality: float) -> datetime:
+    # Rejection sampling against the largest possible weight
+    ceiling = 1 + seasonality
+    while True:
+        moment = start + timedelta(seconds=rng.random() * span_seconds)
+        if rng.random() * ceiling <= _activity_weight(moment, seasonality):
+            return moment
+
+
+def _amount(rng: random.Random, base: float, alpha: float, cap: float) -> float:
+    return round(min(base * rng.paretovariate(alpha), cap), 2)
+
+
+def _user(rng: random.Random, index: int) -> Dict[str, Any]:
+    config = _config
+    start = config["start"]
+    span = config["span_seconds"]
+    # Sign-ups grow over the period: the square root skews towards the end
+    created_at = start + timedelta(seconds=math.sqrt(rng.random()) * span)
+    first_name = FIRST_NAMES[index % len(FIRST_NAMES)]
+    last_name = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return {
+        "id": document_id(config["seed"], "user", index),
+        "email": f"user{index}@example.com",
+        "firstName": first_name,
+        "lastName": last_name,
+        "password": config["password_hash"],
+        "accountNumber": account_number(index),
+        "balance": _amount(rng, 50.0, 1.2, 5_000_000.0),
+        "createdAt": created_at,
+        "role": "user",
+    }
+
+
+def _transaction(rng: random.Random, index: int) -> Dict[str, Any]:
+    config = _config
+    users = config["users"]
+    kind = _pick(rng, TRANSACTION_TYPES)
+    account = account_number(rng.randrange(users))
+    document = {
+        "id": document_id(config["seed"], "transaction", index),
+        "amount": _amount(rng, 5.0, config["amount_alpha"], 1_000_000.0),
+        "type": kind,
+        "timestamp": _seasonal_moment(rng, config["start"], config["span_seconds"], config["seasonality"]),
+        "status": "completed",
+    }
+    if kind == "transfer":
+        if rng.random() < config["hot_share"]:
+            recipient = account_number(rng.randrange(config["hot_accounts"]))
+        else:
+            recipient = account_number(rng.randrange(users))
+        document.update(fromAccount=account, toAccount=recipient, description="Transfer")
+    elif kind == "deposit":
+        document.update(fromAccount=None, toAccount=account, description="Deposit")
+    else:
+        document.update(fromAccount=account, toAccount=None, description="Withdrawal")
+    return document
+
+
+def _loan(rng: random.Random, index: int) -> Dict[str, Any]:
+    config = _config
+    term = rng.choice(LOAN_TERMS)
+    status = _pick(rng, LOAN_STATUSES)
+    request_date = _seasonal_moment(rng, config["start"], config["span_seconds"], config["seasonality"])
+    approval_date = due_date = None
+    if status in ("approved", "paid"):
+        approval_date = request_date + timedelta(hours=rng.uniform(1, 72))
+        due_date = approval_date + timedelta(days=term * 30)
+    return {
+        "id": document_id(config["seed"], "loan", index),
+        "userId": document_id(config["seed"], "user", rng.randrange(config["users"])),
+        "amount": _amount(rng, 500.0, 1.8, 500_000.0),
+        "term": term,
+        "interestRate": 5 + term / 12,
+        "status": status,
+        "requestDate": request_date,
+        "approvalDate": approval_date,
+        "dueDate": due_date,
+    }
+
+
+GENERATORS = {
+    "users": _user,
+    "transactions": _transaction,
+    "loans": _loan,
+}
+
+
+def _init_producer(config: Dict[str, Any]) -> None:
+    global _config, _client
+    _config = config
+    _client = MongoClient(config["mongo"], w=1)
+
+
+def _load_batch(task: Tuple[str, int, int, int]) -> int:
+    collection, batch, start, end = task
+    # A batch's documents depend only on the seed and the batch number
+    rng = random.Random(f"{_config['seed']}:{collection}:{batch}")
+    generate = GENERATORS[collection]
+    documents = [generate(rng, index) for index in range(start, end)]
+    _client[_config["database"]][collection].insert_many(documents, ordered=False)
+    return len(documents)
+
+
+def load(executor: ProcessPoolExecutor, collection: str, count: int, batch_size: int) -> None:
+    if count <= 0:
+        return
+    tasks = [
+        (collection, batch, start, min(start + batch_size, count))
+        for batch, start in enumerate(range(0, count, batch_size))
+    ]
+    started = time.perf_counter()
+    loaded = 0
+    for inserted in executor.map(_load_batch, tasks):
+        loaded += inserted
+        elapsed = time.perf_counter() - started
+        print(f"\r{collection:<12} {loaded:>12,} / {count:,}  {loaded / elapsed:>10,.0f} docs/s", end="", flush=True)
+    print()
+
+
+async def finish(mongo: str, database: str) -> None:
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.core.migrations import run_migrations
+    from app.repositories.rollup_repository import RollupRepository
+
+    client = AsyncIOMotorClient(mongo)
+    db = client[database]
+    started = time.perf_counter()
+    applied = await run_migrations(db)
+    print(f"Migrations applied: {applied or 'none'} ({time.perf_counter() - started:.1f}s)")
+    # Rollups are not maintained by migrations; build them from the loaded history
+    started = time.perf_counter()
+    await RollupRepository(db).rebuild()
+    print(f"Rebuilt analytics rollups ({time.perf_counter() - started:.1f}s)")
+    client.close()
+
+
+def main(args) -> None:
+    from app.core.security import get_password_hash
+
+    end = args.end_date or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    config = {
+        "mongo": args.mongo,
+        "database": args.database,
+        "seed": args.seed,
+        "users": args.users,
+        "start": start,
+        "span_seconds": (end - start).total_seconds(),
+        "hot_accounts": max(1, min(args.hot_accounts, args.users)),
+        "hot_share": args.hot_share,
+        "amount_alpha": args.amount_alpha,
+        "seasonality": args.seasonality,
+        "password_hash": get_password_hash(args.password),
+    }
+
+    if args.drop:
+        MongoClient(args.mongo).drop_database(args.database)
+    print(f"Seeding {args.database} with seed {args.seed}, {start:%Y-%m-%d} .. {end:%Y-%m-%d}, "
+          f"{args.producers} producers")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(args.producers, initializer=_init_producer, initargs=(config,)) as executor:
+        load(executor, "users", args.users, args.batch_size)
+        load(executor, "transactions", args.transactions, args.batch_size)
+        load(executor, "loans", args.loans, args.batch_size)
+    print(f"Loaded in {time.perf_counter() - started:.1f}s")
+    asyncio.run(finish(args.mongo, args.database))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic synthetic data seeder")
+    parser.add_argument("--mongo", default=os.getenv("MONGODB_URI") or "mongodb://localhost:27017")
+    parser.add_argument("--database", default="floosy_load")
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--transactions", type=int, default=10_000_000)
+    parser.add_argument("--loans", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", type=datetime.fromisoformat,
+                        help="last day of generated activity (default: today, UTC)")
+    parser.add_argument("--days", type=int, default=730, help="length of the generated history")
+    parser.add_argument("--hot-accounts", type=int, default=100, help="merchant accounts receiving hot traffic")
+    parser.add_argument("--hot-share", type=float, default=0.3, help="share of transfers sent to merchants")
+    parser.add_argument("--amount-alpha", type=float, default=1.3,
+                        help="Pareto shape of transaction amounts (lower is heavier-tailed)")
+    parser.add_argument("--seasonality", type=float, default=0.4, help="amplitude of the yearly cycle")
+    parser.add_argument("--password", default="password123!")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--producers", type=int, default=os.cpu_count() or 4)
+    main(parser.parse_args())
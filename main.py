@@ -1,11 +1,16 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Header, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from typing import Optional
+import secrets
 import uvicorn
 
 from app.api.routes import auth, users, transactions, loans, admin, admin_stats
 from app.core.config import settings
 from app.core.database import get_database, connect_to_mongo, close_mongo_connection
+from app.core.serialization import FastJSONResponse
+from app.core.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, render_metrics
+from app.core.tracing import TracingMiddleware
 
 # Load environment variables
 load_dotenv()
@@ -15,7 +20,8 @@ app = FastAPI(
     title="Floosy API",
     lifespan=connect_to_mongo,
     description="API for Floosy Banking Platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -27,6 +33,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
+# Outermost, so the recorded latency includes the other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -39,5 +52,18 @@ app.include_router(admin_stats.router, prefix="/api", tags=["Admin Stats"])
 async def health_check():
     return {"status": "healthy", "version": "1.0.0"}
 
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics(authorization: Optional[str] = Header(None)):
+        if settings.METRICS_TOKEN and not secrets.compare_digest(
+            (authorization or "").encode(), f"Bearer {settings.METRICS_TOKEN}".encode()
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=settings.PORT, reload=True)